@@ -0,0 +1,172 @@
+"""
+Benchmark suite for chess challenge solver.
+
+Counts variants of a fixed set of configurations, reports wall time and
+search nodes (pieces placed) per second and compares them with a stored
+baseline. Run with `make bench`, store a new baseline with
+`make bench-baseline`.
+"""
+
+import sys
+import json
+import time
+import argparse
+from collections import namedtuple
+
+from chess_challenge import (
+    ENGINES, Board, _StackSearch, _order_pieces, _pieces, count_variants
+)
+
+BASELINE = 'bench_baseline.json'
+RESULTS = 'bench_results.json'
+
+# counting with 'inplace' runs the same counter as 'recursive', its
+# search only differs when enumerating variants
+BENCH_ENGINES = tuple(engine for engine in ENGINES if engine != 'inplace')
+
+# slowdown relative to baseline reported as a regression
+TOLERANCE = 0.2
+
+Config = namedtuple(
+    'Config',
+    ['name', 'M', 'N', 'kings', 'queens', 'bishops', 'rooks', 'knights',
+     'variants', 'quick']
+)
+
+CONFIGS = (
+    Config('readme_7x7', 7, 7, 2, 2, 2, 0, 1, 3063828, False),
+    Config('kings_rooks_6x6', 6, 6, 3, 0, 0, 2, 0, 48024, True),
+    Config('queens_bishops_6x6', 6, 6, 0, 2, 2, 0, 0, 10468, True),
+    Config('rooks_knights_6x6', 6, 6, 0, 0, 0, 2, 4, 86182, True),
+    Config('queens_8x8', 8, 8, 0, 8, 0, 0, 0, 92, True),
+    Config('queens_9x9', 9, 9, 0, 9, 0, 0, 0, 352, False),
+    Config('queens_knights_7x7', 7, 7, 0, 4, 0, 0, 2, 4368, True),
+    Config('knights_6x6', 6, 6, 0, 0, 0, 0, 9, 716804, False),
+)
+
+
+def _counts(config):
+    return (config.kings, config.queens, config.bishops, config.rooks,
+            config.knights)
+
+
+def nodes(config):
+    """Number of pieces placed by a full search of the configuration."""
+    pieces = _order_pieces(
+        config.M, config.N, _pieces(*_counts(config)), 'static'
+    )
+    search = _StackSearch(config.M, config.N, Board(config.M, config.N),
+                          pieces)
+    search.count()
+    return search.nodes
+
+
+def run(config, engine='recursive', repeat=1):
+    """
+    Time counting variants of the configuration.
+
+    The best of `repeat` runs is taken. Raises AssertionError if the
+    count is wrong, a fast wrong answer is not a speedup.
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = count_variants(config.M, config.N, *_counts(config),
+                               engine=engine)
+        secs = time.perf_counter() - start
+        assert count == config.variants, '{}: got {} variants, not {}'.format(
+            config.name, count, config.variants
+        )
+        best = secs if best is None else min(best, secs)
+
+    placed = nodes(config)
+    return {
+        'secs': best,
+        'nodes': placed,
+        'nodes_per_sec': placed / best if best else 0.0,
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Names of configurations slower than in baseline.
+
+    Configuration is slower if its time is more than `tolerance` above
+    the baseline one. Ones missing in baseline are not compared.
+    """
+    return [
+        name for name, result in sorted(results.items())
+        if name in baseline and
+        result['secs'] > baseline[name]['secs'] * (1 + tolerance)
+    ]
+
+
+def _load(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument('--engine', choices=BENCH_ENGINES, default='recursive',
+                        help='search engine to benchmark')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='take best time of that many runs')
+    parser.add_argument('--quick', action='store_true',
+                        help='only run configurations taking under a second')
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help='only run given configuration, can be repeated')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline file to compare with')
+    parser.add_argument('--output', default=RESULTS,
+                        help='file to write results to')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='store results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown, 0.2 is 20%%')
+    args = parser.parse_args(argv)
+
+    configs = [
+        c for c in CONFIGS
+        if (c.quick or not args.quick) and (
+            not args.only or c.name in args.only)
+    ]
+    baseline = _load(args.baseline) or {}
+    baseline = baseline.get(args.engine, {})
+
+    results = {}
+    for config in configs:
+        result = run(config, args.engine, args.repeat)
+        results[config.name] = result
+        line = '{:<20} {:>9.3f} secs {:>12.0f} nodes/sec'.format(
+            config.name, result['secs'], result['nodes_per_sec']
+        )
+        if config.name in baseline:
+            line += ' {:>+7.1%}'.format(
+                result['secs'] / baseline[config.name]['secs'] - 1
+            )
+        print(line)
+
+    with open(args.output, 'w') as f:
+        json.dump({args.engine: results}, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        stored = _load(args.baseline) or {}
+        stored.setdefault(args.engine, {}).update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(stored, f, indent=2, sort_keys=True)
+        print('Baseline saved to {}'.format(args.baseline))
+        return 0
+
+    slower = compare(results, baseline, args.tolerance)
+    if slower:
+        print('Slower than baseline: {}'.format(', '.join(slower)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,21 @@
 """Module to solve chess challenge."""
 
+import os
+import sys
+import json
 import time
+import random
 import argparse
+from collections import namedtuple, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from result_cache import ResultCache
+from solution_file import SolutionFile, SolutionWriter
+
+try:
+    import numpy
+except ImportError:  # optional, only needed by the numpy engine
+    numpy = None
 
 
 class Piece:
@@ -18,6 +32,14 @@ class Piece:
         """
         raise NotImplementedError
 
+    def attack_mask(self, M, N, i, j):
+        """
+        Bitmask of squares attacked if piece placed at (i, j).
+
+        Out-of-bounds positions and the square itself are left out.
+        """
+        return attack_table(type(self), M, N).masks[i * N + j]
+
 
 class King(Piece):
     """King"""
@@ -131,36 +153,117 @@ class Knight(Piece):
         return self._positions
 
 
+AttackTable = namedtuple('AttackTable', ['positions', 'masks'])
+
+# (piece type, M, N) -> AttackTable, shared by every search in the process
+_ATTACK_TABLES = {}
+
+
+def attack_table(piece_type, M, N):
+    """
+    Get attack table of a piece type for MxN board.
+
+    Built on first use and cached. Both fields are indexed by square
+    i*N + j: `positions` holds a tuple of in-bounds (y, x) attacked from
+    that square and `masks` the same set as a bitmask.
+    """
+    key = (piece_type, M, N)
+    table = _ATTACK_TABLES.get(key)
+    if table is not None:
+        return table
+
+    piece = piece_type()
+    positions = [0] * (M * N)
+    masks = [0] * (M * N)
+    for i in range(M):
+        for j in range(N):
+            affected = sorted(set(
+                (y, x)
+                for (y, x) in piece.affected_positions(M, N, i, j)
+                if y >= 0 and y < M and x >= 0 and x < N and
+                (y, x) != (i, j)
+            ))
+            mask = 0
+            for y, x in affected:
+                mask |= 1 << (y * N + x)
+            positions[i * N + j] = tuple(affected)
+            masks[i * N + j] = mask
+
+    table = AttackTable(tuple(positions), tuple(masks))
+    _ATTACK_TABLES[key] = table
+    return table
+
+
 class Board:
-    """Game board"""
+    """
+    Game board backed by bitboards.
 
-    def __init__(self, M, N):
-        """Init an empty MxN board."""
+    Square (i, j) is bit number i*N + j. `occupied` has a bit set for
+    every square taken by a piece, `attacked` for every square hit by
+    any of them, so validity checks are a couple of AND/OR operations.
+    """
+
+    __slots__ = ('M', 'N', 'occupied', 'attacked', 'pieces', '_key')
+
+    def __init__(self, M, N, occupied=0, attacked=0, pieces=()):
+        """Init an MxN board, empty unless masks are given."""
         self.M = M
         self.N = N
-        self._board = [0] * M
-        for i in range(M):
-            self._board[i] = [' '] * N
+        self.occupied = occupied
+        self.attacked = attacked
+        # tuple of (square, symbol) in placement order
+        self.pieces = pieces
 
         self._key = None
 
+    @property
+    def _board(self):
+        """Board as a list of lists, attacked cells marked with 'x'."""
+        board = [0] * self.M
+        for i in range(self.M):
+            row = [' '] * self.N
+            for j in range(self.N):
+                if self.attacked >> (i * self.N + j) & 1:
+                    row[j] = 'x'
+            board[i] = row
+        for square, symbol in self.pieces:
+            board[square // self.N][square % self.N] = symbol
+        return board
+
+    @_board.setter
+    def _board(self, board):
+        self.occupied = 0
+        self.attacked = 0
+        self.pieces = ()
+        self._key = None
+        for i, row in enumerate(board):
+            for j, value in enumerate(row):
+                self.set(i, j, value)
+
     @property
     def key(self):
         """
         Used to store the board in set.
 
-        Return a single string with all elements of the board.
-        (board itself is mutable so can't be stored in set)
+        Return the set of (square, symbol) pairs, so boards which differ
+        only in the order identical pieces were placed are equal.
         """
-        if not self._key:
-            elements = []
-            for row in self._board:
-                elements += row
-            self._key = ''.join(elements)
+        if self._key is None:
+            self._key = frozenset(self.pieces)
         return self._key
 
     def set(self, i, j, value):
-        self._board[i][j] = value
+        square = i * self.N + j
+        bit = 1 << square
+        self.occupied &= ~bit
+        self.attacked &= ~bit
+        self.pieces = tuple(p for p in self.pieces if p[0] != square)
+        self._key = None
+        if value == 'x':
+            self.attacked |= bit
+        elif value != ' ':
+            self.occupied |= bit
+            self.pieces += ((square, value),)
 
     def place(self, piece, i, j):
         """
@@ -168,162 +271,2172 @@ class Board:
 
         Should return new board or None, if placement is not valid.
         """
-        if self._board[i][j] != ' ':
+        square = i * self.N + j
+        bit = 1 << square
+        if (self.occupied | self.attacked) & bit:
             # if cell is not empty
             return None
 
-        # get all cells that would be affected
-        affected = piece.affected_positions(self.M, self.N, i, j)
-
-        # filter out-of-bounds
-        affected = [
-            (y, x)
-            for (y, x) in affected
-            if y >= 0 and y < self.M and x >= 0 and x < self.N
-        ]
-
-        valid_placement = True
-
-        for y, x in affected:
-            # check if empty
-            if self._board[y][x] not in [' ', 'x']:
-                # cell is taken means we can't use (i,j)
-                valid_placement = False
-                break
-
-        if not valid_placement:
+        affected = piece.attack_mask(self.M, self.N, i, j)
+        if affected & self.occupied:
+            # some piece is under attack means we can't use (i,j)
             return None
 
-        new_board = Board(self.M, self.N)
-        for y in range(self.M):
-            for x in range(self.N):
-                if (y, x) in affected:
-                    new_board.set(y, x, 'x')
-                else:
-                    new_board.set(y, x, self._board[y][x])
-
-        new_board.set(i, j, piece.symbol)
-
-        return new_board
+        return Board(
+            self.M, self.N,
+            self.occupied | bit,
+            self.attacked | affected,
+            self.pieces + ((square, piece.symbol),)
+        )
 
     def is_empty(self, i, j):
         """Check if position is empty"""
-        return self._board[i][j] == ' '
+        return not (self.occupied | self.attacked) >> (i * self.N + j) & 1
 
     def as_list(self):
         """Board as a list with 'x' removed."""
+        board = [0] * self.M
         for i in range(self.M):
-            for j in range(self.N):
-                if self._board[i][j] == 'x':
-                    self._board[i][j] = ' '
-        return self._board
+            board[i] = [' '] * self.N
+        for square, symbol in self.pieces:
+            board[square // self.N][square % self.N] = symbol
+        return board
 
 
-def _reccur(M, N, board, pieces_left, cache):
+def _reccur(M, N, board, pieces_left, start=0):
     """
     Called recursively and puts one piece at each recursion level.
 
     Each next call has smaller pieces_left then it's caller.
-    Returns the final results for given (semi)populated board and pieces.
+    Yields the final boards for given (semi)populated board and pieces
+    as soon as they are found.
+
+    Identical pieces are only placed at strictly increasing squares, so
+    every board is reached once: `start` is the lowest square the first
+    piece may take.
     """
     if not pieces_left:
         # all pieces are placed, means we have a final variant
-        # replace `x` with spaces
-        return [board.as_list()]
+        yield board
+        return
 
-    results = []
     # take first piece from set
     # we will try to put it somewhere
     piece = pieces_left[0]
+    # next piece of the same type goes after this one
+    same = len(pieces_left) > 1 and type(pieces_left[1]) is type(piece)
+
+    # squares neither taken nor attacked
+    occupied = board.occupied
+    attacked = board.attacked
+    taken = occupied | attacked
+    masks = attack_table(type(piece), M, N).masks
+    symbol = piece.symbol
 
     # iterate over a board
-    for i in range(M):
-        for j in range(N):
-            # check if vacant
-            if not board.is_empty(i, j):
-                continue
+    for square in range(start, M * N):
+        # check if vacant
+        if taken >> square & 1:
+            continue
+
+        # check the piece would not attack anything placed before
+        affected = masks[square]
+        if affected & occupied:
+            continue
+
+        new_board = Board(
+            M, N,
+            occupied | 1 << square,
+            attacked | affected,
+            board.pieces + ((square, symbol),)
+        )
+
+        # go to the next recursion level
+        # there, the next piece will be attempted to be placed
+        # and so on
+        yield from _reccur(
+            M, N,
+            new_board,
+            pieces_left[1:],
+            square + 1 if same else 0
+        )
+
+
+class SearchStats:
+    """
+    Counters of a search, per depth of the search tree.
+
+    At depth d piece `symbols[d]` is placed. For it `nodes` counts
+    placements made, `occupied` squares rejected as taken by another
+    piece, `attacked` ones rejected as attacked by a placed piece,
+    `attacking` ones where the piece would attack a placed one and
+    `skipped` squares never tried because an identical piece went there
+    or after (canonical ordering, which replaced the dedup cache).
+    `time` is seconds spent at the depth itself, not counting deeper
+    levels or the consumer of the boards.
+    """
+
+    FIELDS = ('nodes', 'occupied', 'attacked', 'attacking', 'skipped',
+              'time')
+
+    def __init__(self):
+        self.symbols = []
+        for field in self.FIELDS:
+            setattr(self, field, [])
+        self._last = None
+
+    def _grow(self, symbols):
+        """Make room for depths placing given symbols."""
+        for symbol in symbols[len(self.symbols):]:
+            self.symbols.append(symbol)
+            for field in self.FIELDS:
+                getattr(self, field).append(0)
+
+    def _tick(self, depth):
+        """Charge time since the last tick to given depth."""
+        now = time.time()
+        self.time[depth] += now - self._last
+        self._last = now
+
+    def by_depth(self):
+        """List of (symbol, counters dict) pairs, one per depth."""
+        return [
+            (symbol, {field: getattr(self, field)[d]
+                      for field in self.FIELDS})
+            for d, symbol in enumerate(self.symbols)
+        ]
+
+    def by_piece(self):
+        """Counters dict summed over depths of each piece symbol."""
+        totals = OrderedDict()
+        for symbol, counters in self.by_depth():
+            total = totals.setdefault(symbol, dict.fromkeys(self.FIELDS, 0))
+            for field, value in counters.items():
+                total[field] += value
+        return totals
+
+    def report(self):
+        """Counters as a text table."""
+        row = '{:>6} {:>5}' + ' {:>12}' * len(self.FIELDS)
+        lines = [row.format('depth', 'piece', *self.FIELDS)]
+        for d, (symbol, counters) in enumerate(self.by_depth()):
+            lines.append(row.format(d, symbol, *self._cells(counters)))
+        for symbol, counters in self.by_piece().items():
+            lines.append(row.format('all', symbol, *self._cells(counters)))
+        return '\n'.join(lines)
+
+    def _cells(self, counters):
+        return [
+            '{:.3f}'.format(counters[field]) if field == 'time'
+            else counters[field]
+            for field in self.FIELDS
+        ]
 
-            # try place the piece
-            new_board = board.place(piece, i, j)
 
-            # check if placement was valid
-            if not new_board:
+def _reccur_stats(M, N, board, pieces_left, stats, depth=0, start=0,
+                  deadline=None):
+    """
+    Same search as `_reccur`, recording counters into `stats`.
+
+    With a `deadline` the clock is checked at every placement, raising
+    _OutOfTime once past it. Kept apart from `_reccur` so searches
+    without stats pay nothing for them.
+    """
+    if not pieces_left:
+        if depth:
+            stats._tick(depth - 1)
+        try:
+            yield board
+        finally:
+            # time the consumer took is not ours
+            stats._last = time.time()
+        return
+
+    piece = pieces_left[0]
+    same = len(pieces_left) > 1 and type(pieces_left[1]) is type(piece)
+
+    occupied = board.occupied
+    attacked = board.attacked
+    masks = attack_table(type(piece), M, N).masks
+    symbol = piece.symbol
+
+    nodes = rejected_occupied = rejected_attacked = attacking = 0
+    stats.skipped[depth] += start
+    try:
+        for square in range(start, M * N):
+            if occupied >> square & 1:
+                rejected_occupied += 1
+                continue
+            if attacked >> square & 1:
+                rejected_attacked += 1
                 continue
 
-            # check cache to reduce solution space
-            if new_board.key in cache:
-                # aleady had this board configuration
+            affected = masks[square]
+            if affected & occupied:
+                attacking += 1
                 continue
-            cache.add(new_board.key)
 
-            # go to the next recursion level
-            # there, the next piece will be attempted to be placed
-            # and so on
-            results += _reccur(
+            nodes += 1
+            new_board = Board(
                 M, N,
-                new_board,
-                pieces_left[1:],
-                cache
+                occupied | 1 << square,
+                attacked | affected,
+                board.pieces + ((square, symbol),)
             )
+            stats._tick(depth)
+            if deadline is not None:
+                _check_deadline(deadline)
+            yield from _reccur_stats(
+                M, N, new_board, pieces_left[1:], stats, depth + 1,
+                square + 1 if same else 0, deadline
+            )
+    finally:
+        # also when the consumer stops early
+        stats.nodes[depth] += nodes
+        stats.occupied[depth] += rejected_occupied
+        stats.attacked[depth] += rejected_attacked
+        stats.attacking[depth] += attacking
+        stats._tick(depth)
 
-    return results
 
+def _reccur_inplace(board, pieces_left, start=0):
+    """
+    Twin of `_reccur` placing and taking back pieces on one board.
+
+    Placing a piece sets its bits in the board masks, taking it back
+    restores the masks saved before. Squares of placed pieces go to a
+    preallocated list and candidate squares are taken bit by bit from
+    the mask of free ones, so placements copy no boards: the pieces
+    tuple and the board are only built for final boards. Every level
+    still runs in a generator of its own, except the last piece, which
+    is placed in a loop of the level above.
+    """
+    M = board.M
+    N = board.N
+    size = len(pieces_left)
+    if not size:
+        yield Board(M, N, board.occupied, board.attacked, board.pieces)
+        return
+
+    full = (1 << (M * N)) - 1
+    masks = [attack_table(type(p), M, N).masks for p in pieces_left]
+    symbols = [p.symbol for p in pieces_left]
+    # piece goes after the previous one if they are identical
+    same = [
+        k > 0 and type(pieces_left[k]) is type(pieces_left[k - 1])
+        for k in range(size)
+    ]
+    squares = [0] * size
+    placed = board.pieces
+    last = size - 1
+
+    def search(depth, start):
+        piece_masks = masks[depth]
+        occupied = board.occupied
+        attacked = board.attacked
+        # vacant squares not under attack, from `start` up
+        free = full & ~(occupied | attacked) & ~((1 << start) - 1)
+
+        if depth == last:
+            while free:
+                low = free & -free
+                free ^= low
+                square = low.bit_length() - 1
+                affected = piece_masks[square]
+                if affected & occupied:
+                    continue
+                squares[depth] = square
+                yield Board(
+                    M, N, occupied | low, attacked | affected,
+                    placed + tuple(zip(squares, symbols))
+                )
+            return
+
+        next_same = same[depth + 1]
+        while free:
+            low = free & -free
+            free ^= low
+            square = low.bit_length() - 1
+            affected = piece_masks[square]
+            if affected & occupied:
+                continue
+
+            # place, go deeper, take back
+            board.occupied = occupied | low
+            board.attacked = attacked | affected
+            squares[depth] = square
+            yield from search(depth + 1, square + 1 if next_same else 0)
+            board.occupied = occupied
+            board.attacked = attacked
+
+    yield from search(0, start)
 
-def get_variants(M, N, kings=0, queens=0, bishops=0, rooks=0, knights=0):
+
+class _StackSearch:
     """
-    Solve the given task.
+    Depth-first search over an explicit, preallocated stack.
 
-    Returns a list of boards.
+    Level d of the stack holds board masks before piece d is placed and
+    the cursor, the next square to try for that piece. Nothing is
+    allocated while searching and the depth is not limited by
+    recursion. Search state lives on the object, so a search stopped
+    between yields can be picked up again.
     """
-    cache = set()
-    # construct board
-    board = Board(M, N)
 
-    # put together pieces
+    def __init__(self, M, N, board, pieces_left, start=0):
+        size = len(pieces_left)
+        self.M = M
+        self.N = N
+        self.pieces = board.pieces
+        self.masks = [attack_table(type(p), M, N).masks for p in pieces_left]
+        self.symbols = [p.symbol for p in pieces_left]
+        # piece goes after the previous one if they are identical
+        self.same = [
+            k > 0 and type(pieces_left[k]) is type(pieces_left[k - 1])
+            for k in range(size)
+        ]
+
+        self.occupied = [0] * (size + 1)
+        self.attacked = [0] * (size + 1)
+        self.cursors = [0] * (size + 1)
+        self.squares = [0] * size
+        self.occupied[0] = board.occupied
+        self.attacked[0] = board.attacked
+        self.cursors[0] = start
+        self.depth = 0
+        # pieces placed so far, a measure of work done
+        self.nodes = 0
+
+    def state(self):
+        """Position of the search: depth, cursors and placed squares."""
+        return {
+            'depth': self.depth,
+            'cursors': list(self.cursors),
+            'squares': list(self.squares),
+        }
+
+    def restore(self, state):
+        """Continue from a position returned by `state`."""
+        self.depth = state['depth']
+        self.cursors[:] = state['cursors']
+        self.squares[:] = state['squares']
+        for k in range(self.depth):
+            square = self.squares[k]
+            self.occupied[k + 1] = self.occupied[k] | 1 << square
+            self.attacked[k + 1] = self.attacked[k] | self.masks[k][square]
+
+    def _final(self):
+        """Final board on top of the stack."""
+        size = len(self.squares)
+        return Board(
+            self.M, self.N, self.occupied[size], self.attacked[size],
+            self.pieces + tuple(zip(self.squares, self.symbols))
+        )
+
+    def __iter__(self):
+        return self.run()
+
+    def run(self, callback=None, every=4096):
+        """
+        Yield final boards.
+
+        `callback`, if given, is called with the number of boards
+        yielded so far every `every` placements. Search state is
+        consistent then: boards yielded before were handled by the
+        caller and `state()` resumes right after them.
+        """
+        size = len(self.squares)
+        squares_count = self.M * self.N
+        occupied = self.occupied
+        attacked = self.attacked
+        cursors = self.cursors
+        squares = self.squares
+
+        found = 0
+        nodes = 0
+        placed = 0
+        depth = self.depth
+        while depth >= 0:
+            if depth == size:
+                # all pieces are placed, go back after the variant
+                self.depth = depth - 1
+                yield self._final()
+                found += 1
+                depth -= 1
+                continue
+
+            masks = self.masks[depth]
+            occ = occupied[depth]
+            taken = occ | attacked[depth]
+            square = cursors[depth]
+            while square < squares_count and (
+                    taken >> square & 1 or masks[square] & occ):
+                square += 1
+
+            if square == squares_count:
+                # no more squares for this piece, go one level up
+                depth -= 1
+                continue
+
+            # place the piece and go one level down
+            cursors[depth] = square + 1
+            squares[depth] = square
+            occupied[depth + 1] = occ | 1 << square
+            attacked[depth + 1] = attacked[depth] | masks[square]
+            depth += 1
+            placed += 1
+            if depth < size:
+                cursors[depth] = square + 1 if self.same[depth] else 0
+
+            if callback is not None:
+                nodes += 1
+                if nodes == every:
+                    nodes = 0
+                    self.depth = depth
+                    callback(found)
+
+        self.depth = depth
+        self.nodes += placed
+
+    def count(self, callback=None, every=4096):
+        """
+        Count final boards, the last piece is not placed at all.
+
+        `callback` is called with the count so far, the same way as in
+        `run`.
+        """
+        size = len(self.squares)
+        if not size:
+            self.depth = -1
+            return 1
+
+        squares_count = self.M * self.N
+        occupied = self.occupied
+        attacked = self.attacked
+        cursors = self.cursors
+
+        count = 0
+        nodes = 0
+        placed = 0
+        depth = self.depth
+        while depth >= 0:
+            masks = self.masks[depth]
+            occ = occupied[depth]
+            taken = occ | attacked[depth]
+            square = cursors[depth]
+
+            if depth == size - 1:
+                # every valid square of the last piece is a variant
+                for square in range(square, squares_count):
+                    if not (taken >> square & 1 or masks[square] & occ):
+                        count += 1
+                depth -= 1
+                continue
+
+            while square < squares_count and (
+                    taken >> square & 1 or masks[square] & occ):
+                square += 1
+
+            if square == squares_count:
+                depth -= 1
+                continue
+
+            cursors[depth] = square + 1
+            self.squares[depth] = square
+            occupied[depth + 1] = occ | 1 << square
+            attacked[depth + 1] = attacked[depth] | masks[square]
+            depth += 1
+            placed += 1
+            cursors[depth] = square + 1 if self.same[depth] else 0
+
+            if callback is not None:
+                nodes += 1
+                if nodes == every:
+                    nodes = 0
+                    self.depth = depth
+                    callback(count)
+
+        self.depth = depth
+        self.nodes += placed + count
+        return count
+
+
+def _count(M, N, occupied, attacked, pieces_left, start=0):
+    """
+    Counting twin of `_reccur`.
+
+    Walks the same search tree but never builds boards, only returns
+    the number of final variants below given (semi)populated board.
+    """
+    if not pieces_left:
+        return 1
+
+    count = 0
+    piece = pieces_left[0]
+    same = len(pieces_left) > 1 and type(pieces_left[1]) is type(piece)
+    taken = occupied | attacked
+    masks = attack_table(type(piece), M, N).masks
+
+    for square in range(start, M * N):
+        if taken >> square & 1:
+            continue
+
+        affected = masks[square]
+        if affected & occupied:
+            continue
+
+        count += _count(
+            M, N,
+            occupied | 1 << square,
+            attacked | affected,
+            pieces_left[1:],
+            square + 1 if same else 0
+        )
+
+    return count
+
+
+def _dynamic_state(M, N, occupied, attacked, pieces_left, start=0):
+    """
+    Search state used by most-constrained-first engines.
+
+    Returns per remaining piece type: the type, its attack masks, number
+    of pieces left and squares available to it. Pieces of the first
+    type only get squares from `start` on.
+    """
+    full = (1 << (M * N)) - 1
+    types = []
+    masks = []
+    lefts = []
+    avails = []
+    for piece_type, count in _groups(pieces_left):
+        types.append(piece_type)
+        masks.append(attack_table(piece_type, M, N).masks)
+        lefts.append(count)
+        avails.append(_available(masks[-1], occupied, attacked, full))
+    if avails:
+        avails[0] &= ~((1 << start) - 1)
+    return types, masks, tuple(lefts), tuple(avails)
+
+
+def _most_constrained(lefts, avails):
+    """
+    Pick the type with fewest available squares among remaining ones.
+
+    Returns its index, None if nothing is left to place, or -1 if some
+    type has fewer squares than pieces left, so there is no variant.
+    """
+    best = None
+    best_size = 0
+    for h, left in enumerate(lefts):
+        if not left:
+            continue
+        size = bin(avails[h]).count('1')
+        if size < left:
+            return -1
+        if best is None or size < best_size:
+            best = h
+            best_size = size
+    return best
+
+
+def _place_dynamic(masks, lefts, avails, h, square, current):
+    """
+    New (lefts, avails) after piece of type `h` is put on `square`.
+
+    `current` is what is left of type's available squares above the
+    square, identical pieces are placed in increasing order.
+    """
+    low = 1 << square
+    hit = masks[h][square] | low
+    new_avails = [
+        avail & ~(hit | masks[o][square])
+        for o, avail in enumerate(avails)
+    ]
+    new_avails[h] = current & ~hit
+    new_lefts = list(lefts)
+    new_lefts[h] -= 1
+    return tuple(new_lefts), tuple(new_avails)
+
+
+def _reccur_dynamic(M, N, board, types, masks, lefts, avails):
+    """
+    Twin of `_reccur` placing the most constrained piece type first.
+
+    At every level the type with the fewest available squares is
+    picked, branches where some type has no room left are cut early.
+    """
+    h = _most_constrained(lefts, avails)
+    if h is None:
+        yield board
+        return
+    if h < 0:
+        return
+
+    symbol = types[h].symbol
+    current = avails[h]
+    while current:
+        low = current & -current
+        square = low.bit_length() - 1
+        current ^= low
+
+        new_lefts, new_avails = _place_dynamic(
+            masks, lefts, avails, h, square, current
+        )
+        new_board = Board(
+            M, N,
+            board.occupied | low,
+            board.attacked | masks[h][square],
+            board.pieces + ((square, symbol),)
+        )
+        yield from _reccur_dynamic(
+            M, N, new_board, types, masks, new_lefts, new_avails
+        )
+
+
+def _count_dynamic(masks, lefts, avails):
+    """Counting twin of `_reccur_dynamic`."""
+    h = _most_constrained(lefts, avails)
+    if h is None:
+        return 1
+    if h < 0:
+        return 0
+    if sum(lefts) == 1:
+        # last piece can go to any available square
+        return bin(avails[h]).count('1')
+
+    count = 0
+    current = avails[h]
+    while current:
+        low = current & -current
+        square = low.bit_length() - 1
+        current ^= low
+        count += _count_dynamic(
+            masks, *_place_dynamic(masks, lefts, avails, h, square, current)
+        )
+    return count
+
+
+# (piece type, M, N) -> numpy attack matrix
+_ATTACK_MATRICES = {}
+
+
+def attack_matrix(piece_type, M, N):
+    """
+    Get attack table of a piece type for MxN board as numpy matrix.
+
+    Boolean square x square matrix, [s, t] is set if the piece placed
+    at square s attacks square t. Built on first use and cached.
+    """
+    key = (piece_type, M, N)
+    matrix = _ATTACK_MATRICES.get(key)
+    if matrix is None:
+        matrix = numpy.zeros((M * N, M * N), dtype=bool)
+        for square, positions in enumerate(
+                attack_table(piece_type, M, N).positions):
+            for y, x in positions:
+                matrix[square, y * N + x] = True
+        _ATTACK_MATRICES[key] = matrix
+    return matrix
+
+
+def _mask_array(mask, size):
+    """Bitmask as numpy bool array of `size` squares."""
+    packed = numpy.frombuffer(
+        mask.to_bytes((size + 7) // 8, 'little'), dtype=numpy.uint8
+    )
+    return numpy.unpackbits(packed, bitorder='little')[:size].astype(bool)
+
+
+def _candidates(matrix, vacant, squares, start):
+    """
+    Squares where a piece can be placed, computed by numpy at once.
+
+    That is vacant squares from `start` on, from which the piece would
+    not attack any of occupied `squares` (attacks are symmetric).
+    """
+    candidates = vacant[start:]
+    if squares:
+        candidates = candidates & ~matrix[squares, start:].any(axis=0)
+    return numpy.flatnonzero(candidates) + start
+
+
+def _reccur_numpy(M, N, board, pieces_left, vacant, squares, start=0):
+    """
+    Twin of `_reccur` evaluating all squares of a level with numpy.
+
+    `vacant` is a bool array of squares neither taken nor attacked,
+    `squares` a list of occupied ones. Python only loops over squares
+    which passed the checks.
+    """
+    if not pieces_left:
+        yield board
+        return
+
+    piece = pieces_left[0]
+    same = len(pieces_left) > 1 and type(pieces_left[1]) is type(piece)
+    matrix = attack_matrix(type(piece), M, N)
+    masks = attack_table(type(piece), M, N).masks
+
+    for square in _candidates(matrix, vacant, squares, start).tolist():
+        new_vacant = vacant & ~matrix[square]
+        new_vacant[square] = False
+        new_board = Board(
+            M, N,
+            board.occupied | 1 << square,
+            board.attacked | masks[square],
+            board.pieces + ((square, piece.symbol),)
+        )
+        yield from _reccur_numpy(
+            M, N, new_board, pieces_left[1:], new_vacant,
+            squares + [square], square + 1 if same else 0
+        )
+
+
+def _count_numpy(M, N, pieces_left, vacant, squares, start=0):
+    """Counting twin of `_reccur_numpy`."""
+    if not pieces_left:
+        return 1
+
+    piece = pieces_left[0]
+    same = len(pieces_left) > 1 and type(pieces_left[1]) is type(piece)
+    matrix = attack_matrix(type(piece), M, N)
+    candidates = _candidates(matrix, vacant, squares, start)
+    if len(pieces_left) == 1:
+        # last piece can go to any candidate square
+        return len(candidates)
+
+    count = 0
+    for square in candidates.tolist():
+        new_vacant = vacant & ~matrix[square]
+        new_vacant[square] = False
+        count += _count_numpy(
+            M, N, pieces_left[1:], new_vacant, squares + [square],
+            square + 1 if same else 0
+        )
+    return count
+
+
+def _numpy_state(M, N, occupied, attacked):
+    """Vacant squares array and occupied squares list of a board."""
+    if numpy is None:
+        raise ImportError('numpy engine requires numpy to be installed')
+    vacant = ~_mask_array(occupied | attacked, M * N)
+    squares = [s for s in range(M * N) if occupied >> s & 1]
+    return vacant, squares
+
+
+ENGINES = ('recursive', 'inplace', 'iterative', 'numpy')
+
+# version of the solver results in a `ResultCache` are keyed by, bump it
+# when a change could alter them
+ENGINE_VERSION = 1
+
+ORDERS = ('static', 'coverage', 'dynamic')
+
+
+def _order_pieces(M, N, pieces, order):
+    """
+    Arrange pieces for the search according to ordering strategy.
+
+    `static` keeps Queens, Bishops, Rooks, Kings, Knights. `coverage`
+    puts types attacking most squares of MxN board first. `dynamic`
+    keeps static order, picking the next type is left to the engine.
+    """
+    if order not in ORDERS:
+        raise ValueError('Unknown order {!r}'.format(order))
+    if order != 'coverage':
+        return pieces
+
+    def coverage(piece):
+        masks = attack_table(type(piece), M, N).masks
+        return -sum(bin(mask).count('1') for mask in masks)
+
+    # sort is stable, ties keep static order
+    return sorted(pieces, key=coverage)
+
+
+# default size of a transposition table
+MEMO_SIZE = 1 << 18
+
+
+class TranspositionTable:
+    """
+    Bounded map of search states to their completion counts.
+
+    Holds at most `maxsize` entries, least recently used ones are
+    evicted first.
+    """
+
+    def __init__(self, maxsize=MEMO_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """Return stored count or None."""
+        value = self._data.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """Store count, evicting the oldest entry if full."""
+        self._data[key] = value
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+
+# process-wide table, kept warm between searches
+_TABLE = None
+
+
+def _memo_table(maxsize):
+    """Get the process-wide transposition table of given size."""
+    global _TABLE
+    if _TABLE is None or _TABLE.maxsize != maxsize:
+        _TABLE = TranspositionTable(maxsize)
+    return _TABLE
+
+
+def _groups(pieces):
+    """Split pieces into runs of identical ones: [(type, count)]."""
+    groups = []
+    for piece in pieces:
+        if groups and groups[-1][0] is type(piece):
+            groups[-1][1] += 1
+        else:
+            groups.append([type(piece), 1])
+    return [tuple(group) for group in groups]
+
+
+def _available(masks, occupied, attacked, full):
+    """
+    Squares a piece with given attack masks can still take.
+
+    That is vacant squares from which it would not attack any placed
+    piece. Attacks are symmetric, so those are the squares outside of
+    the piece's attack masks from every occupied square.
+    """
+    available = full & ~(occupied | attacked)
+    while occupied:
+        low = occupied & -occupied
+        available &= ~masks[low.bit_length() - 1]
+        occupied ^= low
+    return available
+
+
+def _count_memo(M, N, occupied, attacked, pieces_left, table, start=0):
+    """
+    Count variants below given board memoizing subproblems.
+
+    The state of the search is kept as a mask of available squares per
+    remaining piece type. Completions of a state do not depend on how
+    it was reached, so their number is stored in `table` and reused
+    whenever another branch gets to the same state. Pieces of the first
+    type only get squares from `start` on.
+    """
+    if not pieces_left:
+        return 1
+
+    full = (1 << (M * N)) - 1
+    groups = []
+    avails = []
+    for piece_type, count in _groups(pieces_left):
+        masks = attack_table(piece_type, M, N).masks
+        groups.append((masks, count))
+        avails.append(_available(masks, occupied, attacked, full))
+    avails[0] &= ~((1 << start) - 1)
+
+    # remaining piece mix of each group, keys are valid across searches
+    signatures = [
+        (M, N) + tuple((t.symbol, c) for t, c in _groups(pieces_left)[g:])
+        for g in range(len(groups))
+    ]
+    return _count_state(
+        groups, signatures, 0, groups[0][1], tuple(avails), table
+    )
+
+
+def _count_state(groups, signatures, g, left, avails, table):
+    """
+    Number of completions of a state in `_count_memo`.
+
+    `left` pieces of group `g` are still to be placed, `avails` has
+    available squares of group `g` and all the following ones.
+    """
+    current = avails[0]
+    if g == len(groups) - 1 and left == 1:
+        # last piece can go to any available square
+        return bin(current).count('1')
+
+    key = (signatures[g], left, avails)
+    count = table.get(key)
+    if count is not None:
+        return count
+
+    count = 0
+    masks = groups[g][0]
+    later = groups[g + 1:]
+    rest = avails[1:]
+    while current:
+        low = current & -current
+        square = low.bit_length() - 1
+        # squares below go away too: identical pieces are placed in
+        # increasing order
+        current ^= low
+
+        hit = masks[square] | low
+        new_avails = tuple(
+            avail & ~(hit | group[0][square])
+            for avail, group in zip(rest, later)
+        )
+        if left > 1:
+            count += _count_state(
+                groups, signatures, g, left - 1,
+                (current & ~hit,) + new_avails, table
+            )
+        elif all(new_avails):
+            count += _count_state(
+                groups, signatures, g + 1, groups[g + 1][1],
+                new_avails, table
+            )
+
+    table.put(key, count)
+    return count
+
+
+def _pieces(kings=0, queens=0, bishops=0, rooks=0, knights=0):
+    """Put together pieces in the order they are placed."""
     pieces = []
     pieces += [Queen() for _ in range(queens)]
     pieces += [Bishop() for _ in range(bishops)]
     pieces += [Rook() for _ in range(rooks)]
     pieces += [King() for _ in range(kings)]
     pieces += [Knight() for _ in range(knights)]
+    return pieces
+
+
+def symmetries(M, N):
+    """
+    Symmetry group of MxN board as square permutations.
+
+    Each permutation is a tuple mapping square i*N + j to its image.
+    Square boards have 8 symmetries (rotations and reflections),
+    rectangular ones only 4. Identity always comes first.
+    """
+    transforms = [
+        lambda i, j: (i, j),
+        lambda i, j: (M - 1 - i, N - 1 - j),
+        lambda i, j: (M - 1 - i, j),
+        lambda i, j: (i, N - 1 - j),
+    ]
+    if M == N:
+        transforms += [
+            lambda i, j: (j, i),
+            lambda i, j: (N - 1 - j, M - 1 - i),
+            lambda i, j: (j, M - 1 - i),
+            lambda i, j: (N - 1 - j, i),
+        ]
+
+    permutations = []
+    for transform in transforms:
+        permutation = [0] * (M * N)
+        for i in range(M):
+            for j in range(N):
+                y, x = transform(i, j)
+                permutation[i * N + j] = y * N + x
+        permutations.append(tuple(permutation))
+    return permutations
+
+
+def _orbits(M, N):
+    """
+    Split squares into orbits under the board symmetries.
+
+    Returns a list of (representative, images) pairs, where the
+    representative is the lowest square of the orbit and images maps
+    every square of the orbit to one permutation taking the
+    representative there.
+    """
+    orbits = []
+    permutations = symmetries(M, N)
+    for square in range(M * N):
+        if min(p[square] for p in permutations) < square:
+            continue
+        images = {}
+        for permutation in permutations:
+            images.setdefault(permutation[square], permutation)
+        orbits.append((square, images))
+    return orbits
+
+
+def _pivot(pieces):
+    """
+    Pick the piece search under symmetry is anchored on.
+
+    It is the first piece of the rarest type. Returns the piece, number
+    of pieces of its type and the rest of pieces.
+    """
+    counts = {}
+    for piece in pieces:
+        counts[type(piece)] = counts.get(type(piece), 0) + 1
+    index = min(
+        range(len(pieces)), key=lambda k: (counts[type(pieces[k])], k)
+    )
+    return (
+        pieces[index], counts[type(pieces[index])],
+        pieces[:index] + pieces[index + 1:]
+    )
+
+
+def _split_depth(pieces):
+    """
+    Number of leading pieces to place before splitting the search.
+
+    Split happens after one or two placement levels, even within a run
+    of identical pieces: subtrees then get the lowest square their
+    first piece may take, see `_subtree_start`.
+    """
+    return min(2, len(pieces))
+
+
+def _subtree_start(board, pieces, depth, start=0):
+    """
+    Lowest square piece `depth` may take below a split.
+
+    `board` has the first `depth` pieces placed, the next one has to go
+    after the last of them if they are identical. `start` is the one of
+    the split itself, kept if nothing was placed.
+    """
+    if not depth:
+        return start
+    if depth < len(pieces) and type(pieces[depth]) is type(pieces[depth - 1]):
+        return board.pieces[-1][0] + 1
+    return 0
+
+
+def _prefixes(M, N, board, pieces_left, depth, start=0):
+    """Yield distinct boards with the next `depth` pieces placed."""
+    if not depth:
+        yield board
+        return
+
+    piece = pieces_left[0]
+    same = len(pieces_left) > 1 and type(pieces_left[1]) is type(piece)
+    for square in range(start, M * N):
+        new_board = board.place(piece, square // N, square % N)
+        if not new_board:
+            continue
+        yield from _prefixes(
+            M, N, new_board, pieces_left[1:], depth - 1,
+            square + 1 if same else 0
+        )
+
+
+def _engine(order, engine):
+    """Search engine to use, `dynamic` order comes with its own."""
+    if engine not in ENGINES:
+        raise ValueError('Unknown engine {!r}'.format(engine))
+    return 'dynamic' if order == 'dynamic' else engine
+
+
+def _finals(M, N, board, pieces_left, engine, start=0):
+    """
+    Yield final boards below given board using given engine.
+
+    The first piece goes to `start` or after it.
+    """
+    if engine == 'dynamic':
+        return _reccur_dynamic(
+            M, N, board,
+            *_dynamic_state(
+                M, N, board.occupied, board.attacked, pieces_left, start
+            )
+        )
+    if engine == 'numpy':
+        return _reccur_numpy(
+            M, N, board, pieces_left,
+            *_numpy_state(M, N, board.occupied, board.attacked),
+            start=start
+        )
+    if engine == 'inplace':
+        return _reccur_inplace(
+            Board(M, N, board.occupied, board.attacked, board.pieces),
+            pieces_left, start
+        )
+    if engine == 'iterative':
+        return iter(_StackSearch(M, N, board, pieces_left, start))
+    return _reccur(M, N, board, pieces_left, start)
+
+
+def _count_finals(M, N, board, pieces_left, engine, memo=0, start=0):
+    """
+    Count final boards below given board using given engine.
+
+    Counting with `recursive` engine copies no boards already, so
+    `inplace` one counts the same way.
+    """
+    occupied = board.occupied
+    attacked = board.attacked
+    if memo:
+        return _count_memo(
+            M, N, occupied, attacked, pieces_left, _memo_table(memo), start
+        )
+    if engine == 'dynamic':
+        return _count_dynamic(
+            *_dynamic_state(M, N, occupied, attacked, pieces_left, start)[1:]
+        )
+    if engine == 'numpy':
+        return _count_numpy(
+            M, N, pieces_left, *_numpy_state(M, N, occupied, attacked),
+            start=start
+        )
+    if engine == 'iterative':
+        return _StackSearch(M, N, board, pieces_left, start).count()
+    return _count(M, N, occupied, attacked, pieces_left, start)
+
+
+# one subtree of the search to solve
+_Task = namedtuple(
+    '_Task',
+    ['M', 'N', 'board', 'pieces_left', 'start', 'count_only', 'memo',
+     'engine']
+)
+
+
+def _solve_subtree(task):
+    """
+    Solve one subtree of a split search.
+
+    Returns the number of final boards or their `pieces` tuples.
+    Counting memoizes subproblems if `memo` (table size) is non-zero.
+    Used as worker entry point.
+    """
+    M, N, board, pieces_left, start, count_only, memo, engine = task
+    if count_only:
+        return _count_finals(M, N, board, pieces_left, engine, memo, start)
+    return [
+        final.pieces
+        for final in _finals(M, N, board, pieces_left, engine, start)
+    ]
+
+
+def _solve_subtrees(tasks, workers):
+    """
+    Solve subtrees in order, spread over a process pool if asked to.
+
+    Yields per-subtree results of `_solve_subtree`.
+    """
+    if workers == 1:
+        for task in tasks:
+            yield _solve_subtree(task)
+        return
+
+    # `0` means as many workers as there are cores
+    with ProcessPoolExecutor(max_workers=workers or None) as executor:
+        yield from executor.map(_solve_subtree, tasks, chunksize=4)
+
+
+def _parallel(M, N, pieces, workers, count_only, memo=0,
+              engine='recursive'):
+    """
+    Split the search into independent subtrees, solve them in a pool.
+
+    Yields per-subtree results (pieces tuples or counts) in stable order.
+    """
+    depth = _split_depth(pieces)
+    pieces_left = pieces[depth:]
+    tasks = (
+        _Task(
+            M, N, board, pieces_left, _subtree_start(board, pieces, depth),
+            count_only, memo, engine
+        )
+        for board in _prefixes(M, N, Board(M, N), pieces, depth)
+    )
+    return _solve_subtrees(tasks, workers)
+
+
+# progress of a search: fraction of top-level squares done, variants
+# found, seconds elapsed, variants per second and seconds left or None
+Progress = namedtuple(
+    'Progress', ['fraction', 'found', 'elapsed', 'rate', 'eta']
+)
+
+# seconds between progress reports
+PROGRESS_INTERVAL = 1.0
+
+
+class _Tracker:
+    """Throttled progress reports of a search."""
+
+    def __init__(self, M, N, callback):
+        self.squares = M * N
+        self.callback = callback
+        self.found = 0
+        self.start = self.last = time.time()
+
+    def report(self, square, force=False):
+        """Report, if it is time, with subtrees below `square` done."""
+        now = time.time()
+        if not force and now - self.last < PROGRESS_INTERVAL:
+            return
+        self.last = now
+        fraction = square / self.squares
+        elapsed = now - self.start
+        self.callback(Progress(
+            fraction, self.found, elapsed,
+            self.found / elapsed if elapsed else 0.0,
+            elapsed * (1 - fraction) / fraction if fraction else None
+        ))
+
+
+def _tracked(M, N, pieces, workers, count_only, memo, engine, callback,
+             deadline=None):
+    """
+    Solve the task subtree by subtree, reporting progress to `callback`.
+
+    Subtrees are those of `_parallel`, the square of the first piece
+    placed in a subtree tells how far the search got. Reports come
+    between subtrees and every few thousand variants within one, at
+    most once per PROGRESS_INTERVAL seconds, and once at the end.
+    A single process search of final boards raises _OutOfTime once past
+    `deadline`, if given.
+
+    Returns an iterator of pieces tuples of final boards, or the count.
+    """
+    tracker = _Tracker(M, N, callback)
+    depth = _split_depth(pieces)
+    pieces_left = pieces[depth:]
+    if deadline is not None and workers == 1:
+        boards = _StackSearch(M, N, Board(M, N), pieces[:depth]).run(
+            lambda _: _check_deadline(deadline)
+        )
+    else:
+        boards = _prefixes(M, N, Board(M, N), pieces, depth)
+
+    tasks = (
+        _Task(
+            M, N, board, pieces_left, _subtree_start(board, pieces, depth),
+            count_only, memo, engine
+        )
+        for board in boards
+    )
+
+    # pairs of subtree root board and its result
+    if workers != 1:
+        tasks = list(tasks)
+        subtrees = zip(
+            [task.board for task in tasks], _solve_subtrees(tasks, workers)
+        )
+    elif count_only:
+        subtrees = (
+            (task.board, _count_finals(
+                M, N, task.board, pieces_left, engine, memo, task.start
+            ))
+            for task in tasks
+        )
+    elif deadline is not None:
+        subtrees = (
+            (task.board, _timed_finals(
+                M, N, task.board, pieces_left, engine, deadline, task.start
+            ))
+            for task in tasks
+        )
+    else:
+        subtrees = (
+            (task.board, _finals(
+                M, N, task.board, pieces_left, engine, task.start
+            ))
+            for task in tasks
+        )
+
+    if count_only:
+        for board, count in subtrees:
+            tracker.found += count
+            tracker.report(_top(board))
+        tracker.report(tracker.squares, True)
+        return tracker.found
+    return _tracked_finals(tracker, subtrees)
+
+
+def _top(board):
+    """Square of the first piece placed on the board, 0 if none."""
+    return board.pieces[0][0] if board.pieces else 0
+
+
+def _tracked_finals(tracker, subtrees):
+    """Yield pieces tuples of subtree results, updating `tracker`."""
+    for board, finals in subtrees:
+        top = _top(board)
+        tracker.report(top)
+        for final in finals:
+            # boards from this process, pieces tuples from workers
+            yield getattr(final, 'pieces', final)
+            tracker.found += 1
+            if not tracker.found & 0xfff:
+                tracker.report(top)
+    tracker.report(tracker.squares, True)
+
+
+def _symmetric(M, N, pieces, workers, count_only, memo=0,
+               engine='recursive'):
+    """
+    Solve the task exploring only one square of each symmetry orbit.
+
+    The pivot piece is pinned to the representative square of every
+    orbit and only the rest of pieces is searched. Each variant found
+    stands for its images under the symmetries moving the
+    representative around its orbit: the images are either expanded
+    or, when counting, accounted for by weight. With k pivot-type
+    pieces every variant is reached through each of them, so counts
+    are divided by k and expanded boards are only kept through their
+    lowest pivot-type square.
+
+    Yields final boards as pieces tuples, or returns the count.
+    """
+    if not pieces:
+        return 1 if count_only else iter([()])
+
+    pivot, k, rest = _pivot(pieces)
+    orbits = _orbits(M, N)
+    tasks = [
+        _Task(
+            M, N, Board(M, N).place(pivot, r // N, r % N), rest, 0,
+            count_only, memo, engine
+        )
+        for r, _ in orbits
+    ]
+    results = _solve_subtrees(tasks, workers)
+
+    if count_only:
+        total = sum(
+            len(images) * count
+            for (_, images), count in zip(orbits, results)
+        )
+        return total // k
+
+    return _expand_orbits(orbits, results, pivot.symbol, k)
+
+
+def _expand_orbits(orbits, results, symbol, k):
+    """Yield all images of variants found by `_symmetric`."""
+    for (_, images), finals in zip(orbits, results):
+        for final in finals:
+            for square, permutation in images.items():
+                placed = tuple((permutation[s], p) for (s, p) in final)
+                if k > 1 and square != min(
+                        s for (s, p) in placed if p == symbol):
+                    # same variant is yielded through its lowest pivot
+                    continue
+                yield placed
+
+
+def decode_variant(M, N, variant):
+    """Turn a compact variant into MxN board as a list of lists."""
+    return Board(M, N, pieces=variant).as_list()
+
+
+def _placements(M, N, pieces, workers, symmetry, engine, stats=None,
+                progress=None, deadline=None):
+    """
+    Yield pieces tuples of final boards, in order they are found.
+
+    With a `deadline` (time.time() value) a single process search
+    raises _OutOfTime once past it, see `_timed_finals`.
+    """
+    if progress is not None:
+        if symmetry or stats is not None:
+            raise ValueError('Progress is not tracked with symmetry or stats')
+        yield from _tracked(
+            M, N, pieces, workers, False, 0, engine, progress, deadline
+        )
+        return
+
+    if stats is not None:
+        if workers != 1 or symmetry or engine != 'recursive':
+            raise ValueError(
+                'Stats need a single process recursive static search'
+            )
+        stats._grow([piece.symbol for piece in pieces])
+        stats._last = time.time()
+        for final in _reccur_stats(M, N, Board(M, N), pieces, stats,
+                                   deadline=deadline):
+            yield final.pieces
+        return
+
+    if symmetry:
+        yield from _symmetric(M, N, pieces, workers, False, engine=engine)
+        return
+
+    if workers != 1:
+        for finals in _parallel(M, N, pieces, workers, False, engine=engine):
+            yield from finals
+        return
+
+    if deadline is not None:
+        for final in _timed_finals(M, N, Board(M, N), pieces, engine,
+                                   deadline):
+            yield final.pieces
+        return
+
+    # construct board and start recursion
+    for final in _finals(M, N, Board(M, N), pieces, engine):
+        yield final.pieces
+
+
+# engines searching pieces in given order, square by square
+_STATIC_ENGINES = ('recursive', 'inplace', 'iterative')
+
+
+class _OutOfTime(Exception):
+    """Search went past its deadline."""
+
 
-    # start recursion
-    results = _reccur(M, N, board, pieces, cache)
+def _check_deadline(deadline):
+    if time.time() > deadline:
+        raise _OutOfTime
 
+
+def _timed_finals(M, N, board, pieces_left, engine, deadline, start=0):
+    """
+    Yield final boards of `_finals`, raising _OutOfTime past `deadline`.
+
+    Pieces up to the split of `_parallel` go over an explicit stack
+    checking the clock every few thousand placements, the rest is
+    searched by `engine` with a check between subtrees.
+    """
+    # engines searching in static order give the same variants as
+    # the stack, so it takes all pieces for them
+    if engine in _STATIC_ENGINES:
+        depth = len(pieces_left)
+    else:
+        depth = _split_depth(pieces_left)
+    prefixes = _StackSearch(M, N, board, pieces_left[:depth], start).run(
+        lambda _: _check_deadline(deadline)
+    )
+    for prefix in prefixes:
+        _check_deadline(deadline)
+        yield from _finals(
+            M, N, prefix, pieces_left[depth:], engine,
+            _subtree_start(prefix, pieces_left, depth, start)
+        )
+
+
+class VariantStream:
+    """
+    Iterator over variants of a search with a limit or a time budget.
+
+    Stops after `limit` variants or once past `deadline`. `complete`
+    is then False: the search was cut short, so there may be more
+    variants (or may not, if exactly `limit` of them exist). It is
+    not searched further to tell, the limit is there to stop early.
+    """
+
+    def __init__(self, placements, convert, limit=None, deadline=None):
+        self._placements = placements
+        self._convert = convert
+        self.limit = limit
+        self.deadline = deadline
+        self.count = 0
+        self.complete = True
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.count == self.limit or (
+                self.deadline is not None and time.time() > self.deadline):
+            return self._stop()
+        try:
+            placed = next(self._placements)
+        except _OutOfTime:
+            return self._stop()
+        self.count += 1
+        return self._convert(placed)
+
+    def _stop(self):
+        if self.complete:
+            self.complete = False
+            self._placements.close()
+        raise StopIteration
+
+
+class Variants(list):
+    """List of variants, `complete` is False if the search stopped early."""
+
+    complete = True
+
+
+def _cached_variants(cache, config, variants):
+    """
+    Yield compact variants of the task from `cache` or `variants`.
+
+    Variants searched for are stored in the cache once all of them
+    went through, in a solution file if the cache keeps them.
+    """
+    path = cache.solutions(config)
+    if path is not None:
+        with SolutionFile(path) as solutions:
+            yield from solutions
+        return
+
+    if not cache.keep_solutions:
+        count = 0
+        for variant in variants:
+            yield variant
+            count += 1
+        cache.put(config, count)
+        return
+
+    path = cache.new_file()
+    try:
+        with SolutionWriter(path, *config) as writer:
+            for variant in variants:
+                writer.write(variant)
+                yield variant
+        cache.put(config, writer.count, path)
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def iter_variants(M, N, kings=0, queens=0, bishops=0, rooks=0, knights=0,
+                  workers=1, symmetry=False, order='static', compact=False,
+                  engine='recursive', stats=None, progress=None, limit=None,
+                  time_budget=None, cache=None):
+    """
+    Solve the given task lazily.
+
+    Yields boards one by one as they are found. With `workers` other
+    than 1 the search is spread over a process pool, with `symmetry`
+    only one variant of each family of rotated or reflected ones is
+    searched for and the rest derived from it. `order` is one of
+    ORDERS, the strategy picking which piece is placed next. `engine` is
+    one of ENGINES: `inplace` places and takes back pieces on a single
+    board, `iterative` runs over an explicit stack instead of recursion,
+    `numpy` checks all squares of a level at once with numpy arrays.
+
+    With `compact` each board is a tuple of (square, symbol) pairs
+    sorted by square i*N + j instead of a list of lists, see
+    `decode_variant`.
+
+    With a `SearchStats` object as `stats` counters of the search are
+    recorded into it. Only a single process search with `recursive`
+    engine and no symmetry can record them.
+
+    `progress`, if given, is called with a `Progress` of the search
+    every PROGRESS_INTERVAL seconds or so and once when it is done.
+    Fraction of the search done is the fraction of squares the first
+    piece went through. Not available with `symmetry`.
+
+    With `limit` or `time_budget` (seconds) the search stops after that
+    many variants or that much time and a `VariantStream` is returned,
+    its `complete` tells whether the search was cut short. Only a
+    single process search without symmetry can be stopped. The clock
+    is checked while searching, also when tracking stats or progress.
+
+    With a `ResultCache` as `cache` variants of a task solved before
+    with solutions kept come from its solution file, in the order they
+    were found then. Otherwise the count, and the solutions if the
+    cache keeps them, are stored once all variants are yielded.
+    Searches with stats, progress, limit or time budget skip the cache.
+    """
+    pieces = _order_pieces(
+        M, N, _pieces(kings, queens, bishops, rooks, knights), order
+    )
+    if compact:
+        def convert(placed):
+            return tuple(sorted(placed))
+    else:
+        def convert(placed):
+            return decode_variant(M, N, placed)
+
+    if limit is None and time_budget is None:
+        placements = _placements(
+            M, N, pieces, workers, symmetry, _engine(order, engine), stats,
+            progress
+        )
+        if cache is not None and stats is None and progress is None:
+            placements = _cached_variants(
+                cache, (M, N, kings, queens, bishops, rooks, knights),
+                (tuple(sorted(placed)) for placed in placements)
+            )
+        return (convert(placed) for placed in placements)
+
+    if workers != 1 or symmetry:
+        raise ValueError(
+            'Only a single process search without symmetry can be stopped'
+        )
+    deadline = None if time_budget is None else time.time() + time_budget
+    placements = _placements(
+        M, N, pieces, workers, symmetry, _engine(order, engine), stats,
+        progress, deadline
+    )
+    return VariantStream(placements, convert, limit, deadline)
+
+
+def get_variants(M, N, kings=0, queens=0, bishops=0, rooks=0, knights=0,
+                 workers=1, symmetry=False, order='static', compact=False,
+                 engine='recursive', stats=None, progress=None, limit=None,
+                 time_budget=None, cache=None):
+    """
+    Solve the given task.
+
+    Returns a `Variants` list of boards, compact ones if asked to. Its
+    `complete` is False if `limit` or `time_budget` stopped the search
+    early, see `iter_variants`.
+    """
+    variants = iter_variants(
+        M, N, kings, queens, bishops, rooks, knights, workers, symmetry,
+        order, compact, engine, stats, progress, limit, time_budget, cache
+    )
+    result = Variants(variants)
+    result.complete = getattr(variants, 'complete', True)
+    return result
+
+
+def count_variants(M, N, kings=0, queens=0, bishops=0, rooks=0, knights=0,
+                   workers=1, symmetry=False, memo=0, order='static',
+                   engine='recursive', progress=None, cache=None):
+    """
+    Solve the given task without building the boards.
+
+    With non-zero `memo` counts of subproblems are kept in a
+    transposition table of at most that many entries, shared by all
+    searches of the process. The memoizing engine places piece types
+    in the order they come, so `dynamic` order is the same as `static`
+    for it. `progress` is called the way `iter_variants` does it.
+    A count in `cache` (a `ResultCache`) is returned straight away,
+    a new one is stored there.
+
+    Returns the number of variants.
+    """
+    if cache is not None and progress is None:
+        config = (M, N, kings, queens, bishops, rooks, knights)
+        count = cache.count(config)
+        if count is None:
+            count = count_variants(
+                M, N, kings, queens, bishops, rooks, knights, workers,
+                symmetry, memo, order, engine
+            )
+            cache.put(config, count)
+        return count
+
+    pieces = _order_pieces(
+        M, N, _pieces(kings, queens, bishops, rooks, knights), order
+    )
+    engine = _engine(order, engine)
+
+    if progress is not None:
+        if symmetry:
+            raise ValueError('Progress is not tracked with symmetry')
+        return _tracked(M, N, pieces, workers, True, memo, engine, progress)
+
+    if symmetry:
+        return _symmetric(M, N, pieces, workers, True, memo, engine)
+    if workers != 1:
+        return sum(_parallel(M, N, pieces, workers, True, memo, engine))
+    return _count_finals(M, N, Board(M, N), pieces, engine, memo)
+
+
+def compare_orders(M, N, kings=0, queens=0, bishops=0, rooks=0, knights=0,
+                   **kwargs):
+    """
+    Time counting variants with every ordering strategy.
+
+    Extra arguments are passed to `count_variants`.
+    Returns a list of (order, seconds) pairs, fastest first.
+    """
+    timings = []
+    for order in ORDERS:
+        start_t = time.time()
+        count_variants(
+            M, N, kings, queens, bishops, rooks, knights, order=order,
+            **kwargs
+        )
+        timings.append((order, time.time() - start_t))
+    return sorted(timings, key=lambda timing: timing[1])
+
+
+def solve_many(configs, count_only=True, memo=MEMO_SIZE, compact=True,
+               engine='recursive', cache=None):
+    """
+    Solve a batch of tasks.
+
+    `configs` are (M, N, kings, queens, bishops, rooks, knights)
+    sequences. Tasks are solved grouped by board size, so attack tables
+    of a size are built once and its memoized subproblem counts (with
+    non-zero `memo`, when counting) are still in the shared table when
+    the next task of that size comes. Repeated tasks are solved once.
+    Results come from and go to `cache`, a `ResultCache`, if given.
+
+    Returns counts, or lists of variants without `count_only`, in the
+    order of `configs`.
+    """
+    configs = [tuple(config) for config in configs]
+    results = [None] * len(configs)
+    solved = {}
+    by_size = sorted(range(len(configs)), key=lambda k: configs[k][:2])
+    for k in by_size:
+        config = configs[k]
+        if config not in solved:
+            if count_only:
+                solved[config] = count_variants(
+                    *config, memo=memo, engine=engine, cache=cache
+                )
+            else:
+                solved[config] = get_variants(
+                    *config, compact=compact, engine=engine, cache=cache
+                )
+        results[k] = solved[config]
     return results
 
 
+def read_configs(lines):
+    """
+    Parse tasks of a batch, one per line.
+
+    A line holds M, N and the numbers of kings, queens, bishops, rooks
+    and knights separated by whitespace. Empty lines and ones starting
+    with `#` are skipped. Returns a list of tuples.
+    """
+    configs = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        try:
+            config = tuple(int(value) for value in line.split())
+        except ValueError:
+            config = ()
+        if len(config) != 7:
+            raise ValueError(
+                'Line {}: expected M N kings queens bishops rooks knights, '
+                'got {!r}'.format(number, line)
+            )
+        configs.append(config)
+    return configs
+
+
+def _nth_path(M, N, pieces, k, table):
+    """
+    Squares of `pieces` in the k-th variant of the static search.
+
+    Walks the states of `_count_memo` from the empty board, at every
+    step skipping whole subtrees by their memoized completion counts,
+    down to the one holding variant k. Returns None if there are no
+    more than k variants.
+    """
+    full = (1 << (M * N)) - 1
+    types = _groups(pieces)
+    groups = [(attack_table(t, M, N).masks, c) for t, c in types]
+    signatures = [
+        (M, N) + tuple((t.symbol, c) for t, c in types[g:])
+        for g in range(len(types))
+    ]
+
+    squares = []
+    g = 0
+    left = groups[0][1] if groups else 0
+    avails = (full,) * len(groups)
+    while g < len(groups):
+        masks = groups[g][0]
+        later = groups[g + 1:]
+        rest = avails[1:]
+        last = g == len(groups) - 1 and left == 1
+        current = avails[0]
+        while True:
+            if not current:
+                return None
+            low = current & -current
+            square = low.bit_length() - 1
+            current ^= low
+
+            hit = masks[square] | low
+            new_avails = tuple(
+                avail & ~(hit | group[0][square])
+                for avail, group in zip(rest, later)
+            )
+            size = 0
+            if last:
+                size = 1
+            elif left > 1:
+                child = (g, left - 1, (current & ~hit,) + new_avails)
+                size = _count_state(groups, signatures, *child, table=table)
+            elif all(new_avails):
+                child = (g + 1, groups[g + 1][1], new_avails)
+                size = _count_state(groups, signatures, *child, table=table)
+            if k < size:
+                break
+            k -= size
+
+        squares.append(square)
+        if last:
+            break
+        g, left, avails = child
+    return squares if k == 0 else None
+
+
+def _variant(pieces, squares):
+    """Compact variant with `pieces` on `squares`."""
+    return tuple(sorted(
+        (square, piece.symbol) for piece, square in zip(pieces, squares)
+    ))
+
+
+def nth_variant(config, k):
+    """
+    Variant k of the task without enumerating the ones before it.
+
+    `config` is (M, N, kings, queens, bishops, rooks, knights).
+    Variants are numbered in the order `get_variants` with default
+    arguments finds them, negative k counts from the end. Counts of
+    skipped subtrees are memoized in the process-wide transposition
+    table, so memory use stays bounded. Returns a compact variant,
+    raises IndexError if there is no variant k.
+    """
+    M, N = config[:2]
+    pieces = _pieces(*config[2:])
+    table = _memo_table(MEMO_SIZE)
+    if k < 0:
+        k += _count_memo(M, N, 0, 0, pieces, table)
+    path = _nth_path(M, N, pieces, k, table) if k >= 0 else None
+    if path is None:
+        raise IndexError('variant index out of range')
+    return _variant(pieces, path)
+
+
+def variants_page(config, offset, size):
+    """
+    Variants `offset` to `offset + size` of the task.
+
+    The first one is found by `nth_variant`, the search resumes right
+    after it for the rest. Returns a list of compact variants, shorter
+    than `size` at the end of the variants.
+    """
+    M, N = config[:2]
+    pieces = _pieces(*config[2:])
+    if size <= 0 or offset < 0:
+        return []
+    path = _nth_path(M, N, pieces, offset, _memo_table(MEMO_SIZE))
+    if path is None:
+        return []
+
+    page = [_variant(pieces, path)]
+    if pieces:
+        search = _StackSearch(M, N, Board(M, N), pieces)
+        # the position of the search right after yielding the variant
+        search.restore({
+            'depth': len(pieces) - 1,
+            'cursors': [square + 1 for square in path] + [0],
+            'squares': path,
+        })
+        for final in search.run():
+            if len(page) == size:
+                break
+            page.append(tuple(sorted(final.pieces)))
+    return page
+
+
+def sample_variants(config, n, seed=None, replace=False):
+    """
+    Draw `n` variants of the task uniformly at random.
+
+    Variant indexes are drawn from the number of variants and found by
+    `nth_variant` descent, nothing is enumerated. Without `replace`
+    variants are distinct, like `random.sample`, with it they are
+    drawn independently. The same `seed` gives the same variants.
+    Returns a list of compact variants, raises ValueError if there are
+    fewer than `n` variants to draw distinct ones from.
+    """
+    M, N = config[:2]
+    pieces = _pieces(*config[2:])
+    table = _memo_table(MEMO_SIZE)
+    total = _count_memo(M, N, 0, 0, pieces, table)
+
+    rng = random.Random(seed)
+    if replace:
+        if n and not total:
+            raise ValueError('Task has no variants to sample')
+        indexes = [rng.randrange(total) for _ in range(n)]
+    else:
+        indexes = rng.sample(range(total), n)
+    return [
+        _variant(pieces, _nth_path(M, N, pieces, k, table))
+        for k in indexes
+    ]
+
+
+def _save_checkpoint(path, state):
+    """Write checkpoint atomically, a crash leaves the old one intact."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _print_variant(M, N, i, variant):
+    """Print i-th variant to stdout."""
+    print('Board {}'.format(i))
+    for row in decode_variant(M, N, variant):
+        print(row)
+
+    print(' ')
+
+
+def _print_progress(progress):
+    """Print a progress report to stderr."""
+    eta = progress.eta
+    print(
+        '{:.1%} done, {} variants, {:.0f} variants/sec, {} left'.format(
+            progress.fraction, progress.found, progress.rate,
+            'unknown' if eta is None else '{:.0f} secs'.format(eta)
+        ),
+        file=sys.stderr
+    )
+
+
+def _run_checkpointed(M, N, counts, full_output, count_only, order, output,
+                      checkpoint, resume, every):
+    """
+    Solve the task with iterative engine, saving progress periodically.
+
+    Every `every` seconds the search position and number of variants
+    so far go to `checkpoint` file (`resume` one if not given). Run
+    started from `resume` checkpoint continues right after the last
+    variant recorded there: printing numbers boards from there on and
+    `output` file is cut back to the recorded number of variants.
+
+    Returns the number of variants, including ones of resumed runs.
+    """
+    config = [M, N] + list(counts)
+    pieces = _order_pieces(M, N, _pieces(*counts), order)
+    search = _StackSearch(M, N, Board(M, N), pieces)
+
+    base = 0
+    if resume:
+        with open(resume) as f:
+            state = json.load(f)
+        if (state['config'], state['order'], state['count_only']) != \
+                (config, order, count_only):
+            raise ValueError(
+                'Checkpoint {} is for another task'.format(resume)
+            )
+        search.restore(state)
+        base = state['count']
+
+    writer = None
+    if output and not count_only:
+        writer = SolutionWriter(output, M, N, *counts, count=base)
+
+    def save(found):
+        if writer:
+            writer.flush()
+        sys.stdout.flush()
+        state = search.state()
+        state.update(
+            config=config, order=order, count_only=count_only,
+            count=base + found
+        )
+        _save_checkpoint(checkpoint or resume, state)
+
+    last_t = [time.time()]
+
+    def tick(found):
+        if time.time() - last_t[0] >= every:
+            save(found)
+            last_t[0] = time.time()
+
+    if count_only:
+        found = search.count(tick)
+    else:
+        found = 0
+        for final in search.run(tick):
+            variant = tuple(sorted(final.pieces))
+            if writer:
+                writer.write(variant)
+            elif full_output:
+                _print_variant(M, N, base + found, variant)
+            found += 1
+
+    # finished search resumes to the final count straight away
+    save(found)
+    if writer:
+        writer.close()
+    return base + found
+
+
 def main(M, N, kings=0, queens=0, bishops=0, rooks=0, knights=0,
-         full_output=True):
-    """Interface to the command line."""
+         full_output=True, count_only=False, workers=1, symmetry=False,
+         memo=0, order='static', output=None, engine='recursive',
+         checkpoint=None, resume=None, checkpoint_every=60, stats=False,
+         progress=False, limit=None, time_budget=None, cache=None):
+    """
+    Interface to the command line.
+
+    With `output` variants are streamed into that solution file
+    instead of being printed, also when only counting. With
+    `checkpoint` or `resume` the search runs with iterative engine in
+    one process and can be continued after being killed, see
+    `_run_checkpointed`. With `stats` counters of the search are
+    printed at the end, see `SearchStats`. With `progress` the fraction
+    of the search done and time left are printed to stderr as it goes.
+    `limit` and `time_budget` stop the search early, see
+    `iter_variants`. Results come from and go to `cache`, a
+    `ResultCache`, if given.
+    """
     start_t = time.time()
-    variants = get_variants(M, N, kings, queens, bishops, rooks, knights)
-    if full_output:
-        for i, board in enumerate(variants):
-            print('Board {}'.format(i))
-            for row in board:
-                print(row)
-
-            print(' ')
+    search_stats = SearchStats() if stats else None
+    on_progress = _print_progress if progress else None
+    variants = None
+    if checkpoint or resume:
+        if workers != 1 or symmetry or memo or order == 'dynamic':
+            raise ValueError(
+                'Checkpoints need a single process static search'
+            )
+        if stats or progress:
+            raise ValueError('Checkpointed runs record no stats or progress')
+        if limit is not None or time_budget is not None:
+            raise ValueError('Checkpointed runs take no limit or time budget')
+        count = _run_checkpointed(
+            M, N, (kings, queens, bishops, rooks, knights), full_output,
+            count_only, order, output, checkpoint, resume, checkpoint_every
+        )
+    elif count_only and not (output or stats) and limit is None and \
+            time_budget is None:
+        count = count_variants(
+            M, N, kings, queens, bishops, rooks, knights, workers=workers,
+            symmetry=symmetry, memo=memo, order=order, engine=engine,
+            progress=on_progress, cache=cache
+        )
+    else:
+        count = 0
+        variants = iter_variants(
+            M, N, kings, queens, bishops, rooks, knights, workers=workers,
+            symmetry=symmetry, order=order, compact=True, engine=engine,
+            stats=search_stats, progress=on_progress, limit=limit,
+            time_budget=time_budget, cache=cache
+        )
+        if output:
+            with SolutionWriter(
+                    output, M, N, kings, queens, bishops, rooks,
+                    knights) as writer:
+                for variant in variants:
+                    writer.write(variant)
+            count = writer.count
+        for variant in variants:
+            if full_output and not count_only:
+                _print_variant(M, N, count, variant)
+            count += 1
     print(
         'Got {} variants in {} secs'.format(
-            len(variants), time.time() - start_t
+            count, time.time() - start_t
         )
     )
-    return len(variants)
+    if not getattr(variants, 'complete', True):
+        print('Search stopped early, there may be more variants')
+    if search_stats is not None:
+        print(search_stats.report())
+    return count
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Chess challenge.')
-    parser.add_argument('M', type=int)
-    parser.add_argument('N', type=int)
-    parser.add_argument('kings', type=int)
-    parser.add_argument('queens', type=int)
-    parser.add_argument('bishops', type=int)
-    parser.add_argument('rooks', type=int)
-    parser.add_argument('knights', type=int)
+    positionals = ('M', 'N', 'kings', 'queens', 'bishops', 'rooks',
+                   'knights')
+    for name in positionals:
+        # left out with --batch
+        parser.add_argument(name, type=int, nargs='?')
     parser.add_argument('--compact', action="store_true")
+    parser.add_argument('--count-only', action="store_true")
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='worker processes, 0 for all cores')
+    parser.add_argument('--symmetry', action="store_true",
+                        help='search only up to rotations and reflections')
+    parser.add_argument('--memo', type=int, default=0, metavar='SIZE',
+                        help='with --count-only, memoize up to SIZE '
+                             'subproblem counts')
+    parser.add_argument('--order', choices=ORDERS, default='static',
+                        help='strategy picking the next piece to place')
+    parser.add_argument('--compare-orders', action="store_true",
+                        help='time counting with every order and exit')
+    parser.add_argument('--output', metavar='FILE',
+                        help='write variants to binary solution FILE')
+    parser.add_argument('--engine', choices=ENGINES, default='recursive',
+                        help='search engine, numpy needs numpy installed')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='save search progress to FILE periodically')
+    parser.add_argument('--resume', metavar='FILE',
+                        help='continue search saved to checkpoint FILE')
+    parser.add_argument('--checkpoint-every', type=float, default=60,
+                        metavar='SECS',
+                        help='seconds between checkpoints (default 60)')
+    parser.add_argument('--stats', action="store_true",
+                        help='print search counters per depth and piece')
+    parser.add_argument('--progress', action="store_true",
+                        help='report progress and time left to stderr')
+    parser.add_argument('--limit', type=int, metavar='COUNT',
+                        help='stop after COUNT variants')
+    parser.add_argument('--time-budget', type=float, metavar='SECS',
+                        help='stop after SECS seconds')
+    parser.add_argument('--batch', metavar='FILE',
+                        help='count variants of tasks listed in FILE, one '
+                             '"M N kings queens bishops rooks knights" per '
+                             'line, - for stdin')
+    parser.add_argument('--no-cache', action="store_true",
+                        help='neither use nor store cached results')
+    parser.add_argument('--cache-solutions', action="store_true",
+                        help='keep solution files of solved tasks in the '
+                             'cache, not only counts')
     args = parser.parse_args()
-    main(
-        args.M, args.N, args.kings, args.queens, args.bishops,
-        args.rooks, args.knights, not args.compact
-    )
+    if args.batch is None and None in [getattr(args, name)
+                                       for name in positionals]:
+        parser.error('the following arguments are required: {}'.format(
+            ', '.join(positionals)
+        ))
+    result_cache = None
+    if not args.no_cache:
+        result_cache = ResultCache(
+            version=ENGINE_VERSION, keep_solutions=args.cache_solutions
+        )
+    if args.batch is not None:
+        start_t = time.time()
+        if args.batch == '-':
+            configs = read_configs(sys.stdin)
+        else:
+            with open(args.batch) as f:
+                configs = read_configs(f)
+        counts = solve_many(
+            configs, memo=args.memo or MEMO_SIZE,
+            engine=args.engine, cache=result_cache
+        )
+        for config, count in zip(configs, counts):
+            print(' '.join(str(value) for value in config + (count,)))
+        print('Solved {} tasks in {} secs'.format(
+            len(configs), time.time() - start_t
+        ))
+    elif args.compare_orders:
+        timings = compare_orders(
+            args.M, args.N, args.kings, args.queens, args.bishops,
+            args.rooks, args.knights, workers=args.jobs,
+            symmetry=args.symmetry, memo=args.memo, engine=args.engine
+        )
+        for order, secs in timings:
+            print('{}: {} secs'.format(order, secs))
+        print('Fastest order: {}'.format(timings[0][0]))
+    else:
+        main(
+            args.M, args.N, args.kings, args.queens, args.bishops,
+            args.rooks, args.knights, not args.compact, args.count_only,
+            args.jobs, args.symmetry, args.memo, args.order, args.output,
+            args.engine, args.checkpoint, args.resume, args.checkpoint_every,
+            args.stats, args.progress, args.limit, args.time_budget,
+            result_cache
+        )
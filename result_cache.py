@@ -0,0 +1,194 @@
+"""
+Persistent cache of chess challenge results.
+
+Results are kept in a sqlite database in the cache directory, keyed by
+the task (M, N, kings, queens, bishops, rooks, knights) and the version
+of the solver that found them. Each entry holds the number of variants
+and optionally a solution file (see `solution_file.py`) with all of
+them, stored next to the database. Least recently used entries are
+evicted once there are more than `maxsize` of them or their solution
+files take more than `max_bytes`.
+"""
+
+import os
+import time
+import sqlite3
+import tempfile
+
+# environment variable overriding the default cache directory
+DIRECTORY_ENV = 'CHESS_CHALLENGE_CACHE'
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS results (
+    M INTEGER, N INTEGER, kings INTEGER, queens INTEGER, bishops INTEGER,
+    rooks INTEGER, knights INTEGER, version INTEGER,
+    count INTEGER NOT NULL,
+    solutions TEXT,
+    size INTEGER NOT NULL DEFAULT 0,
+    used REAL NOT NULL,
+    PRIMARY KEY (M, N, kings, queens, bishops, rooks, knights, version)
+)
+'''
+
+_KEY = ('M = ? AND N = ? AND kings = ? AND queens = ? AND bishops = ? AND '
+        'rooks = ? AND knights = ? AND version = ?')
+
+
+def default_directory():
+    """Cache directory from the environment or under ~/.cache."""
+    return os.environ.get(DIRECTORY_ENV) or os.path.join(
+        os.path.expanduser('~'), '.cache', 'chess_challenge'
+    )
+
+
+class ResultCache:
+    """
+    Results of solved tasks kept on disk between runs.
+
+    `version` is part of every key, entries of other solver versions
+    are never returned. With `keep_solutions` searches enumerating
+    variants store solution files, otherwise only counts.
+    """
+
+    def __init__(self, directory=None, version=1, maxsize=10000,
+                 max_bytes=1 << 30, keep_solutions=False):
+        self.directory = directory or default_directory()
+        self.version = version
+        self.keep_solutions = keep_solutions
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._db = sqlite3.connect(
+            os.path.join(self.directory, 'results.sqlite')
+        )
+        with self._db:
+            self._db.execute(_SCHEMA)
+
+    def _key(self, config):
+        config = tuple(config)
+        if len(config) != 7:
+            raise ValueError(
+                'Expected M, N and 5 piece counts, got {}'.format(config)
+            )
+        return config + (self.version,)
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+
+    def _get(self, config, column):
+        key = self._key(config)
+        with self._db:
+            row = self._db.execute(
+                'SELECT {} FROM results WHERE {}'.format(column, _KEY), key
+            ).fetchone()
+            if row is not None:
+                self._db.execute(
+                    'UPDATE results SET used = ? WHERE {}'.format(_KEY),
+                    (time.time(),) + key
+                )
+        return None if row is None else row[0]
+
+    def count(self, config):
+        """Number of variants of the task or None if not cached."""
+        return self._get(config, 'count')
+
+    def solutions(self, config):
+        """Path of the solution file of the task or None."""
+        name = self._get(config, 'solutions')
+        if name is None:
+            return None
+        path = os.path.join(self.directory, name)
+        if not os.path.exists(path):
+            # removed behind our back, keep the count only
+            with self._db:
+                self._db.execute(
+                    'UPDATE results SET solutions = NULL, size = 0 '
+                    'WHERE {}'.format(_KEY), self._key(config)
+                )
+            return None
+        return path
+
+    def new_file(self):
+        """Path of a fresh temporary file in the cache directory."""
+        fd, path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        os.close(fd)
+        return path
+
+    def put(self, config, count, solutions=None):
+        """
+        Store the number of variants of the task.
+
+        `solutions`, if given, is a finished solution file with all
+        variants (best made by `new_file`), it is moved into the cache.
+        """
+        key = self._key(config)
+        name = None
+        size = 0
+        if solutions is not None:
+            name = '{}.sol'.format('-'.join(str(value) for value in key))
+            os.replace(solutions, os.path.join(self.directory, name))
+            size = os.path.getsize(os.path.join(self.directory, name))
+        with self._db:
+            if name is None:
+                # do not forget solutions stored before
+                row = self._db.execute(
+                    'SELECT solutions, size FROM results WHERE {}'.format(
+                        _KEY), key
+                ).fetchone()
+                if row is not None:
+                    name, size = row
+            self._db.execute(
+                'INSERT OR REPLACE INTO results VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                key + (count, name, size, time.time())
+            )
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until within limits."""
+        with self._db:
+            entries, size = self._db.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results'
+            ).fetchone()
+            rows = self._db.execute(
+                'SELECT M, N, kings, queens, bishops, rooks, knights, '
+                'version, solutions, size FROM results ORDER BY used'
+            )
+            evicted = []
+            for row in rows:
+                if entries <= self.maxsize and size <= self.max_bytes:
+                    break
+                evicted.append(row)
+                entries -= 1
+                size -= row[-1]
+            for row in evicted:
+                self._db.execute(
+                    'DELETE FROM results WHERE {}'.format(_KEY), row[:-2]
+                )
+                if row[-2] is not None:
+                    try:
+                        os.remove(os.path.join(self.directory, row[-2]))
+                    except FileNotFoundError:
+                        pass
+
+    def clear(self):
+        """Remove all entries and their solution files."""
+        with self._db:
+            for name, in self._db.execute(
+                    'SELECT solutions FROM results '
+                    'WHERE solutions IS NOT NULL'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            self._db.execute('DELETE FROM results')
+
+    def close(self):
+        """Close the database."""
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,272 @@
+"""
+Long-lived chess challenge solver answering JSON-lines requests.
+
+Requests are read one JSON object per line from stdin or from clients
+of a Unix socket and solved by a pool of worker processes. Workers stay
+up between requests, so attack tables and memoized subproblem counts
+built for one request are there for the next ones. Every response is
+one JSON line carrying the `id` of its request:
+
+    {"id": 1, "op": "count", "config": [7, 7, 2, 2, 2, 0, 1]}
+    {"id": 1, "count": 3063828}
+
+    {"id": 2, "op": "page", "config": [6, 6, 3, 0, 0, 2, 0],
+     "offset": 100, "size": 2}
+    {"id": 2, "offset": 100, "variants": [[[0, "R"], ...], ...]}
+
+    {"id": 3, "op": "cancel", "target": 1}
+    {"id": 1, "cancelled": true}
+    {"id": 3, "cancelled": true}
+
+    {"id": 4, "op": "status"}
+    {"id": 4, "queued": 0, "running": 1}
+
+Ids are strings or integers, count and page requests need one not
+used by another request still running. Failed requests get an `error`
+instead. Responses come as requests finish, not necessarily in the
+order they were sent.
+"""
+
+import os
+import sys
+import json
+import argparse
+import threading
+import socketserver
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import chess_challenge
+from chess_challenge import MEMO_SIZE, count_variants, variants_page
+
+# seconds between checks of the cancel flag of a running request
+CANCEL_INTERVAL = 0.1
+
+
+class _Cancelled(Exception):
+    """Request was cancelled while running."""
+
+
+def _check_id(value, key):
+    """Raise ValueError unless `value` of request `key` is an id or null."""
+    # bool is an int, but true would stand for request 1
+    if isinstance(value, bool) or \
+            not isinstance(value, (str, int, type(None))):
+        raise ValueError('{} must be a string, an integer or null'.format(
+            key))
+
+
+def _solve(request, cancelled, memo, interval):
+    """
+    Solve one request in a worker process.
+
+    Counting reports progress every `interval` seconds, the report
+    gives up on the request once `cancelled` event is set. Pages skip
+    to their first variant by subtree counts and are not stopped once
+    running. Returns the response without the id.
+    """
+    chess_challenge.PROGRESS_INTERVAL = interval
+
+    def check(_):
+        if cancelled.is_set():
+            raise _Cancelled
+
+    try:
+        config = request['config']
+        if len(config) != 7:
+            raise ValueError('config is M, N and 5 piece counts')
+        if request['op'] == 'count':
+            return {'count': count_variants(
+                *config, memo=memo, progress=check
+            )}
+        offset = request.get('offset', 0)
+        size = request['size']
+        if offset < 0 or size < 0:
+            raise ValueError('offset and size can not be negative')
+        return {
+            'offset': offset, 'variants': variants_page(config, offset, size)
+        }
+    except _Cancelled:
+        return {'cancelled': True}
+    except (KeyError, TypeError, ValueError) as error:
+        return {'error': '{}: {}'.format(type(error).__name__, error)}
+
+
+class Server:
+    """
+    Pool of solver workers shared by any number of request streams.
+
+    `workers` is the number of processes, 0 for one per core. Counts
+    memoize up to `memo` subproblems in every worker.
+    """
+
+    def __init__(self, workers=1, memo=MEMO_SIZE):
+        self.memo = memo
+        self._executor = ProcessPoolExecutor(max_workers=workers or None)
+        self._manager = multiprocessing.Manager()
+        self._lock = threading.Lock()
+        # request id: (future, cancel event)
+        self._jobs = {}
+
+    def status(self):
+        """
+        Numbers of queued and running requests.
+
+        Requests handed over to the pool count as running, the pool
+        takes one more than it has workers.
+        """
+        with self._lock:
+            futures = [future for future, _ in self._jobs.values()]
+        running = sum(future.running() for future in futures)
+        return {'queued': len(futures) - running, 'running': running}
+
+    def handle(self, lines, send):
+        """
+        Answer requests from `lines` until they run out.
+
+        `send` is called with every response dict, possibly from other
+        threads. Returns once all requests from `lines` are answered.
+        """
+        answered = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                request_id = request.get('id')
+                op = request['op']
+                _check_id(request_id, 'id')
+                _check_id(request.get('target'), 'target')
+            except (ValueError, AttributeError, KeyError) as error:
+                send({'id': None, 'error': 'Bad request: {}'.format(error)})
+                continue
+
+            response = {'id': request_id}
+            if op == 'status':
+                response.update(self.status())
+            elif op == 'cancel':
+                response.update(self.cancel(request.get('target')))
+            elif op in ('count', 'page'):
+                with self._lock:
+                    busy = request_id in self._jobs
+                if request_id is None:
+                    response['error'] = 'Request needs an id'
+                elif busy:
+                    response['error'] = 'Request {} is running'.format(
+                        request_id)
+                else:
+                    answered.append(self._submit(request, send))
+                    continue
+            else:
+                response['error'] = 'Unknown op {!r}'.format(op)
+            send(response)
+
+        for event in answered:
+            event.wait()
+
+    def _submit(self, request, send):
+        """Hand request to the pool, return event set once answered."""
+        request_id = request.get('id')
+        answered = threading.Event()
+        cancelled = self._manager.Event()
+        future = self._executor.submit(
+            _solve, request, cancelled, self.memo, CANCEL_INTERVAL
+        )
+        with self._lock:
+            self._jobs[request_id] = (future, cancelled)
+
+        def done(future):
+            with self._lock:
+                self._jobs.pop(request_id, None)
+            response = {'id': request_id}
+            if future.cancelled():
+                response['cancelled'] = True
+            elif future.exception() is not None:
+                response['error'] = str(future.exception())
+            else:
+                response.update(future.result())
+            try:
+                send(response)
+            finally:
+                answered.set()
+
+        future.add_done_callback(done)
+        return answered
+
+    def cancel(self, request_id):
+        """Cancel a queued or running request."""
+        with self._lock:
+            job = self._jobs.get(request_id)
+        if job is None:
+            return {'error': 'No request {}'.format(request_id)}
+        future, cancelled = job
+        # queued requests never start, running ones stop at next check
+        if not future.cancel():
+            cancelled.set()
+        return {'cancelled': True}
+
+    def close(self):
+        """Stop the workers."""
+        self._executor.shutdown()
+        self._manager.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _writer(stream, binary=False):
+    """Thread-safe `send` writing JSON lines to `stream`."""
+    lock = threading.Lock()
+
+    def send(response):
+        line = json.dumps(response) + '\n'
+        with lock:
+            stream.write(line.encode() if binary else line)
+            stream.flush()
+    return send
+
+
+def serve_socket(server, path):
+    """Answer clients connecting to Unix socket at `path` forever."""
+    class Connection(socketserver.StreamRequestHandler):
+        def handle(self):
+            server.handle(
+                (line.decode() for line in self.rfile),
+                _writer(self.wfile, binary=True)
+            )
+
+    if os.path.exists(path):
+        os.remove(path)
+    unix = socketserver.ThreadingUnixStreamServer(path, Connection)
+    try:
+        unix.serve_forever()
+    finally:
+        unix.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Answer chess challenge requests, one JSON per line.'
+    )
+    parser.add_argument('--socket', metavar='PATH',
+                        help='listen on Unix socket PATH instead of stdin')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='worker processes, 0 for all cores')
+    parser.add_argument('--memo', type=int, default=MEMO_SIZE,
+                        metavar='SIZE',
+                        help='memoized subproblem counts per worker')
+    args = parser.parse_args(argv)
+
+    with Server(args.workers, args.memo) as server:
+        if args.socket:
+            serve_socket(server, args.socket)
+        else:
+            server.handle(sys.stdin, _writer(sys.stdout))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""
+Binary file format for chess challenge variants.
+
+File starts with a fixed size header followed by fixed width records,
+one per variant. A record lists the square index (i*N + j) of every
+piece: Kings first, then Queens, Bishops, Rooks and Knights, squares of
+the same type in increasing order. Squares take one byte on boards up to
+256 squares and two bytes otherwise.
+"""
+
+import mmap
+import struct
+
+MAGIC = b'CHSV'
+VERSION = 1
+
+# order pieces are stored in a record, same as on the command line
+SYMBOLS = 'KQBRN'
+_RANKS = {symbol: rank for rank, symbol in enumerate(SYMBOLS)}
+
+# magic, version, square width, M, N, kings, queens, bishops, rooks,
+# knights, record size, number of records
+HEADER = struct.Struct('<4sBBHHHHHHHHQ')
+
+
+def _square_format(M, N):
+    """Struct format char of a square index on MxN board."""
+    return 'B' if M * N <= 256 else 'H'
+
+
+class SolutionWriter:
+    """
+    Stream variants into a solution file.
+
+    Variants are compact ones, tuples of (square, symbol) pairs.
+    Number of records is written to the header on close. With non-zero
+    `count` the file is reopened: its first `count` records are kept
+    and new ones appended after them, anything past them is dropped.
+    """
+
+    def __init__(self, path, M, N, kings=0, queens=0, bishops=0, rooks=0,
+                 knights=0, count=0):
+        self.M = M
+        self.N = N
+        self.counts = (kings, queens, bishops, rooks, knights)
+        self.count = count
+        self._record = struct.Struct(
+            '<{}{}'.format(sum(self.counts), _square_format(M, N))
+        )
+        if count:
+            self._file = open(path, 'r+b')
+            self._file.truncate(HEADER.size + count * self._record.size)
+            self._file.seek(0, 2)
+        else:
+            self._file = open(path, 'wb')
+            self._write_header()
+
+    def _write_header(self):
+        self._file.write(HEADER.pack(
+            MAGIC, VERSION, struct.calcsize(_square_format(self.M, self.N)),
+            self.M, self.N, *self.counts, self._record.size, self.count
+        ))
+
+    def write(self, variant):
+        """Append one variant."""
+        squares = sorted(variant, key=lambda p: (_RANKS[p[1]], p[0]))
+        self._file.write(self._record.pack(*[s for s, _ in squares]))
+        self.count += 1
+
+    def write_record(self, record):
+        """Append one raw record, as returned by `SolutionFile.record`."""
+        if len(record) != self._record.size:
+            raise ValueError('record is {} bytes, not {}'.format(
+                len(record), self._record.size
+            ))
+        self._file.write(record)
+        self.count += 1
+
+    def flush(self):
+        """Make sure all written records are in the file."""
+        self._file.flush()
+
+    def close(self):
+        """Finish the header and close the file."""
+        if self._file.closed:
+            return
+        self._file.seek(0)
+        self._write_header()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SolutionFile:
+    """
+    Memory-mapped solution file with random access to its records.
+
+    `record(i)` is a zero-copy view of raw record i, indexing decodes
+    it into a compact variant.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        (magic, version, width, self.M, self.N, kings, queens, bishops,
+         rooks, knights, self.record_size, self.count) = HEADER.unpack_from(
+             self._mmap
+        )
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError('{} is not a solution file'.format(path))
+        self.counts = (kings, queens, bishops, rooks, knights)
+
+        self._symbols = ''.join(
+            symbol * count for symbol, count in zip(SYMBOLS, self.counts)
+        )
+        self._record = struct.Struct(
+            '<{}{}'.format(len(self._symbols), _square_format(self.M, self.N))
+        )
+
+    def __len__(self):
+        return self.count
+
+    def record(self, i):
+        """Raw bytes of record i as a memoryview into the file."""
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError('record index out of range')
+        offset = HEADER.size + i * self.record_size
+        return self._view[offset:offset + self.record_size]
+
+    def __getitem__(self, i):
+        squares = self._record.unpack(self.record(i))
+        return tuple(sorted(zip(squares, self._symbols)))
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self[i]
+
+    def close(self):
+        """Release the mapping."""
+        self._view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -1,7 +1,25 @@
+import os
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
-
-from chess_challenge import (get_variants, main, Queen, King, Bishop,
-                             Rook, Knight, Board)
+from unittest import mock
+
+import bench
+import chess_challenge
+import server
+import work_units
+from result_cache import ResultCache
+from chess_challenge import (get_variants, iter_variants, count_variants,
+                             main, Queen, King, Bishop, Rook, Knight, Board,
+                             attack_table, symmetries, TranspositionTable,
+                             ORDERS, compare_orders, decode_variant, ENGINES,
+                             numpy, SearchStats, solve_many, read_configs,
+                             nth_variant, variants_page, sample_variants)
+from solution_file import HEADER, SolutionFile, SolutionWriter
 
 
 PIECE_DICT = {
@@ -602,11 +620,866 @@ class Tests(unittest.TestCase):
         ]
         self.assertEqual(new_board, should_be)
 
+    def test_board_masks(self):
+        """Test bitboard bookkeeping of placement."""
+        board = Board(3, 3).place(King(), 0, 0)
+        self.assertEqual(board.occupied, 0b000000001)
+        self.assertEqual(board.attacked, 0b000011010)
+        self.assertEqual(board.pieces, ((0, 'K'),))
+        self.assertFalse(board.is_empty(1, 1))
+        self.assertTrue(board.is_empty(2, 2))
+
+        # (0, 1) is attacked by the king
+        self.assertIsNone(board.place(Rook(), 0, 1))
+        # rook at (2, 0) would attack the king
+        self.assertIsNone(board.place(Rook(), 2, 0))
+
+        new_board = board.place(Rook(), 2, 2)
+        self.assertEqual(new_board.as_list(), [
+            ['K', ' ', ' '],
+            [' ', ' ', ' '],
+            [' ', ' ', 'R'],
+        ])
+        # original board is left untouched
+        self.assertEqual(board.pieces, ((0, 'K'),))
+
+    def test_attack_table(self):
+        """Test precomputed attack tables."""
+        table = attack_table(Knight, 3, 4)
+        self.assertIs(table, attack_table(Knight, 3, 4))
+        self.assertEqual(len(table.masks), 12)
+        # from (0, 0) only (1, 2) and (2, 1) are in bounds
+        self.assertEqual(table.positions[0], ((1, 2), (2, 1)))
+        self.assertEqual(table.masks[0], 1 << 6 | 1 << 9)
+
+        # queen's table never contains the square itself
+        table = attack_table(Queen, 3, 3)
+        self.assertEqual(len(table.positions[4]), 8)
+        self.assertEqual(table.masks[4], 0b111101111)
+
+    def test_count_variants(self):
+        """Test counting agrees with full solving."""
+        self.assertEqual(count_variants(3, 3, kings=2, rooks=1), 4)
+        self.assertEqual(count_variants(3, 3, queens=1, bishops=1), 16)
+        self.assertEqual(count_variants(4, 4, rooks=2, knights=4), 8)
+        self.assertEqual(
+            count_variants(5, 4, kings=1, queens=1, bishops=1, knights=1),
+            len(get_variants(5, 4, kings=1, queens=1, bishops=1, knights=1))
+        )
+
+    def test_iter_variants(self):
+        """Test lazy solving yields the same boards."""
+        variants = iter_variants(3, 3, kings=2, rooks=1)
+        first = next(variants)
+        self.assertEqual(len(first), 3)
+        rest = list(variants)
+        self.assertEqual(
+            sorted([first] + rest),
+            sorted(get_variants(3, 3, kings=2, rooks=1))
+        )
+
+    def test_parallel(self):
+        """Test search split over a process pool."""
+        for M, N, pieces in [
+            (3, 3, dict(kings=2, rooks=1)),
+            (4, 4, dict(rooks=2, knights=4)),
+            (5, 4, dict(kings=2, queens=1, bishops=1, knights=1)),
+            (5, 5, dict(queens=5)),
+            (5, 4, dict(knights=5)),
+        ]:
+            variants = get_variants(M, N, **pieces)
+            self.assertEqual(
+                sorted(get_variants(M, N, workers=2, **pieces)),
+                sorted(variants)
+            )
+            self.assertEqual(
+                count_variants(M, N, workers=2, **pieces), len(variants)
+            )
+
+        # identical pieces are split too, subtrees start after the split
+        pieces = chess_challenge._pieces(knights=5)
+        with mock.patch.object(chess_challenge, '_solve_subtrees',
+                               lambda tasks, workers: list(tasks)):
+            tasks = chess_challenge._parallel(5, 4, pieces, 2, True)
+        self.assertGreater(len(tasks), 1)
+        for task in tasks:
+            self.assertEqual(len(task.board.pieces), 2)
+            self.assertEqual(len(task.pieces_left), 3)
+            self.assertEqual(task.start, task.board.pieces[-1][0] + 1)
+        self.assertEqual(
+            sum(chess_challenge._solve_subtree(task) for task in tasks),
+            count_variants(5, 4, knights=5)
+        )
+
+    def test_symmetries(self):
+        """Test board symmetry groups."""
+        self.assertEqual(len(symmetries(3, 3)), 8)
+        self.assertEqual(len(symmetries(3, 4)), 4)
+        for permutation in symmetries(3, 4):
+            self.assertEqual(sorted(permutation), list(range(12)))
+
+        # rotations used by tests are a part of the group
+        board = [
+            ['K', ' ', 'K'],
+            [' ', ' ', ' '],
+            [' ', 'R', ' '],
+        ]
+        images = []
+        for permutation in symmetries(3, 3):
+            image = [[' '] * 3 for _ in range(3)]
+            for square in range(9):
+                y, x = divmod(permutation[square], 3)
+                image[y][x] = board[square // 3][square % 3]
+            images.append(image)
+        for premutation in self._rotate_premutations(board):
+            self.assertTrue(premutation in images)
+
+    def test_symmetry_search(self):
+        """Test search up to symmetry finds the same variants."""
+        for M, N, pieces in [
+            (3, 3, dict(kings=2, rooks=1)),
+            (3, 3, dict(queens=1, bishops=1)),
+            (4, 4, dict(rooks=2, knights=4)),
+            (5, 4, dict(kings=2, queens=1, bishops=1, knights=1)),
+            (4, 5, dict(kings=2, queens=2, knights=2)),
+            (3, 3, dict()),
+        ]:
+            variants = get_variants(M, N, **pieces)
+            symmetric = get_variants(M, N, symmetry=True, **pieces)
+            self.assertEqual(len(symmetric), len(variants))
+            self.assertEqual(sorted(symmetric), sorted(variants))
+            self.assertEqual(
+                count_variants(M, N, symmetry=True, **pieces), len(variants)
+            )
+        self.assertEqual(
+            count_variants(4, 4, rooks=2, knights=4, symmetry=True,
+                           workers=2),
+            8
+        )
+
+    def test_memo_count(self):
+        """Test memoized counting."""
+        for M, N, pieces in [
+            (3, 3, dict(kings=2, rooks=1)),
+            (3, 3, dict(queens=1, bishops=1)),
+            (4, 4, dict(rooks=2, knights=4)),
+            (5, 4, dict(kings=2, queens=1, bishops=1, knights=1)),
+            (6, 6, dict(queens=6)),
+            (3, 3, dict()),
+        ]:
+            count = count_variants(M, N, **pieces)
+            self.assertEqual(count_variants(M, N, memo=1000, **pieces), count)
+            self.assertEqual(
+                count_variants(M, N, memo=2, symmetry=True, **pieces), count
+            )
+
+    def test_transposition_table(self):
+        """Test table keeps recently used entries."""
+        table = TranspositionTable(2)
+        table.put('a', 1)
+        table.put('b', 2)
+        self.assertEqual(table.get('a'), 1)
+        table.put('c', 3)
+        self.assertEqual(len(table), 2)
+        self.assertIsNone(table.get('b'))
+        self.assertEqual(table.get('a'), 1)
+        self.assertEqual((table.hits, table.misses), (2, 1))
+
+    def test_orders(self):
+        """Test every ordering strategy finds the same variants."""
+        for M, N, pieces in [
+            (3, 3, dict(kings=2, rooks=1)),
+            (4, 4, dict(rooks=2, knights=4)),
+            (5, 4, dict(kings=2, queens=1, bishops=1, knights=1)),
+            (3, 3, dict()),
+        ]:
+            variants = sorted(get_variants(M, N, **pieces))
+            for order in ORDERS:
+                self.assertEqual(
+                    sorted(get_variants(M, N, order=order, **pieces)),
+                    variants
+                )
+                self.assertEqual(
+                    sorted(get_variants(M, N, order=order, symmetry=True,
+                                        **pieces)),
+                    variants
+                )
+                self.assertEqual(
+                    count_variants(M, N, order=order, **pieces),
+                    len(variants)
+                )
+                self.assertEqual(
+                    count_variants(M, N, order=order, workers=2, **pieces),
+                    len(variants)
+                )
+
+        with self.assertRaises(ValueError):
+            count_variants(3, 3, kings=1, order='random')
+
+        timings = compare_orders(4, 4, rooks=2, knights=4)
+        self.assertEqual(sorted(order for order, _ in timings),
+                         sorted(ORDERS))
+
+    def test_compact(self):
+        """Test compact variants."""
+        variants = get_variants(3, 3, kings=2, rooks=1, compact=True)
+        self.assertEqual(len(variants), 4)
+        self.assertIn(((0, 'K'), (2, 'K'), (7, 'R')), variants)
+        self.assertEqual(
+            sorted(decode_variant(3, 3, variant) for variant in variants),
+            sorted(get_variants(3, 3, kings=2, rooks=1))
+        )
+        self.assertEqual(
+            sorted(get_variants(4, 4, rooks=2, knights=4, compact=True,
+                                symmetry=True)),
+            sorted(get_variants(4, 4, rooks=2, knights=4, compact=True))
+        )
+
+    def test_solution_file(self):
+        """Test writing and reading binary solution files."""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'variants.bin')
+
+        variants = get_variants(
+            5, 4, kings=2, queens=1, bishops=1, knights=1, compact=True
+        )
+        with SolutionWriter(path, 5, 4, kings=2, queens=1, bishops=1,
+                            knights=1) as writer:
+            for variant in variants:
+                writer.write(variant)
+
+        with SolutionFile(path) as solutions:
+            self.assertEqual((solutions.M, solutions.N), (5, 4))
+            self.assertEqual(solutions.counts, (2, 1, 1, 0, 1))
+            self.assertEqual(solutions.record_size, 5)
+            self.assertEqual(len(solutions), len(variants))
+            self.assertEqual(solutions[7], variants[7])
+            self.assertEqual(solutions[-1], variants[-1])
+            self.assertEqual(list(solutions), variants)
+            record = solutions.record(0)
+            self.assertEqual(len(record), 5)
+            record.release()
+            with self.assertRaises(IndexError):
+                solutions.record(len(variants))
+
+        self.assertEqual(
+            os.path.getsize(path), HEADER.size + 5 * len(variants)
+        )
+
+        # boards over 256 squares take two bytes per square
+        with SolutionWriter(path, 20, 20, queens=1) as writer:
+            writer.write(((399, 'Q'),))
+        with SolutionFile(path) as solutions:
+            self.assertEqual(solutions.record_size, 2)
+            self.assertEqual(solutions[0], ((399, 'Q'),))
+
+    @unittest.skipUnless(numpy, 'numpy is not installed')
+    def test_numpy_engine(self):
+        """Test numpy-vectorized search."""
+        for M, N, pieces in [
+            (3, 3, dict(kings=2, rooks=1)),
+            (4, 4, dict(rooks=2, knights=4)),
+            (5, 4, dict(kings=2, queens=1, bishops=1, knights=1)),
+            (3, 3, dict()),
+        ]:
+            variants = sorted(get_variants(M, N, **pieces))
+            self.assertEqual(
+                sorted(get_variants(M, N, engine='numpy', **pieces)),
+                variants
+            )
+            self.assertEqual(
+                count_variants(M, N, engine='numpy', **pieces),
+                len(variants)
+            )
+            self.assertEqual(
+                count_variants(M, N, engine='numpy', symmetry=True,
+                               **pieces),
+                len(variants)
+            )
+
+    def test_inplace_engine(self):
+        """Test in-place search finds the same variants."""
+        for M, N, pieces in [
+            (3, 3, dict(kings=2, rooks=1)),
+            (4, 4, dict(rooks=2, knights=4)),
+            (5, 4, dict(kings=2, queens=1, bishops=1, knights=1)),
+        ]:
+            self.assertEqual(
+                sorted(get_variants(M, N, engine='inplace', **pieces)),
+                sorted(get_variants(M, N, **pieces))
+            )
+            self.assertEqual(
+                sorted(get_variants(M, N, engine='inplace', workers=2,
+                                    **pieces)),
+                sorted(get_variants(M, N, **pieces))
+            )
+
+    def test_iterative_engine(self):
+        """Test explicit stack search finds the same variants."""
+        for M, N, pieces in [
+            (3, 3, dict(kings=2, rooks=1)),
+            (4, 4, dict(rooks=2, knights=4)),
+            (5, 4, dict(kings=2, queens=1, bishops=1, knights=1)),
+            (3, 3, dict()),
+        ]:
+            variants = sorted(get_variants(M, N, **pieces))
+            self.assertEqual(
+                sorted(get_variants(M, N, engine='iterative', **pieces)),
+                variants
+            )
+            self.assertEqual(
+                count_variants(M, N, engine='iterative', **pieces),
+                len(variants)
+            )
+            self.assertEqual(
+                count_variants(M, N, engine='iterative', symmetry=True,
+                               **pieces),
+                len(variants)
+            )
+
+    def test_iterative_depth(self):
+        """Test explicit stack search is not limited by recursion."""
+        depth = 0
+        frame = sys._getframe()
+        while frame:
+            depth += 1
+            frame = frame.f_back
+
+        # warm up the table, building it takes frames too
+        attack_table(Knight, 4, 6)
+        limit = sys.getrecursionlimit()
+        # not enough frames for recursion over 12 pieces
+        sys.setrecursionlimit(depth + 14)
+        try:
+            count = count_variants(4, 6, knights=12, engine='iterative')
+            variants = get_variants(4, 6, knights=12, engine='iterative')
+        finally:
+            sys.setrecursionlimit(limit)
+
+        self.assertEqual(count, 3)
+        self.assertEqual(len(variants), 3)
+
+    def test_engines(self):
+        """Test engine validation."""
+        self.assertIn('recursive', ENGINES)
+        with self.assertRaises(ValueError):
+            count_variants(3, 3, kings=1, engine='quantum')
+
+    def test_checkpoint(self):
+        """Test killed runs resume without losing or repeating variants."""
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        checkpoint = os.path.join(tmp_dir, 'checkpoint.json')
+        output = os.path.join(tmp_dir, 'variants.bin')
+        pieces = dict(kings=2, queens=1, bishops=1, knights=1)
+        variants = get_variants(6, 5, compact=True, **pieces)
+
+        # killed while writing, after some checkpoints
+        write = SolutionWriter.write
+        calls = []
+
+        def killing_write(writer, variant):
+            calls.append(variant)
+            if len(calls) == 20000:
+                raise KeyboardInterrupt
+            write(writer, variant)
+
+        with mock.patch.object(SolutionWriter, 'write', killing_write):
+            with self.assertRaises(KeyboardInterrupt):
+                main(6, 5, output=output, checkpoint=checkpoint,
+                     checkpoint_every=0, **pieces)
+        with open(checkpoint) as f:
+            self.assertLess(json.load(f)['count'], 20000)
+
+        results_len = main(6, 5, output=output, resume=checkpoint, **pieces)
+        self.assertEqual(results_len, len(variants))
+        with SolutionFile(output) as solutions:
+            self.assertEqual(sorted(solutions), sorted(variants))
+
+        # resuming a finished run gives the result straight away
+        self.assertEqual(
+            main(6, 5, output=output, resume=checkpoint, **pieces),
+            len(variants)
+        )
+
+        # killed right after a checkpoint while counting
+        save = chess_challenge._save_checkpoint
+
+        def killing_save(path, state):
+            save(path, state)
+            raise KeyboardInterrupt
+
+        os.remove(checkpoint)
+        with mock.patch.object(chess_challenge, '_save_checkpoint',
+                               killing_save):
+            with self.assertRaises(KeyboardInterrupt):
+                main(6, 5, count_only=True, checkpoint=checkpoint,
+                     checkpoint_every=0, **pieces)
+        self.assertEqual(
+            main(6, 5, count_only=True, resume=checkpoint, **pieces),
+            len(variants)
+        )
+
+        # checkpoint of another task is refused
+        with self.assertRaises(ValueError):
+            main(6, 5, kings=2, count_only=True, resume=checkpoint)
+
     def test_main(self):
         """Test main method."""
         results_len = main(3, 3, kings=2, rooks=1, full_output=True)
         self.assertEqual(results_len, 4)
 
+        results_len = main(4, 4, rooks=2, knights=4, count_only=True)
+        self.assertEqual(results_len, 8)
+
+        tmp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp_dir)
+        path = os.path.join(tmp_dir, 'variants.bin')
+        results_len = main(3, 3, kings=2, rooks=1, output=path)
+        self.assertEqual(results_len, 4)
+        with SolutionFile(path) as solutions:
+            self.assertEqual(
+                sorted(decode_variant(3, 3, v) for v in solutions),
+                sorted(get_variants(3, 3, kings=2, rooks=1))
+            )
+
+        # counting still writes the file
+        os.remove(path)
+        results_len = main(4, 4, rooks=2, knights=4, count_only=True,
+                           output=path)
+        self.assertEqual(results_len, 8)
+        with SolutionFile(path) as solutions:
+            self.assertEqual(
+                list(solutions),
+                get_variants(4, 4, rooks=2, knights=4, compact=True)
+            )
+
+    def test_bench(self):
+        """Test benchmark counts nodes and finds slowdowns."""
+        config = bench.Config('queens', 3, 3, 0, 2, 0, 0, 0, 8, True)
+        result = bench.run(config)
+        # 9 squares for the first queen, 8 variants with the second one
+        self.assertEqual(result['nodes'], 9 + 8)
+        self.assertGreater(result['nodes_per_sec'], 0)
+        with self.assertRaises(AssertionError):
+            bench.run(config._replace(variants=5))
+
+        results = {'a': {'secs': 1.3}, 'b': {'secs': 1.1}, 'c': {'secs': 9}}
+        baseline = {'a': {'secs': 1.0}, 'b': {'secs': 1.0}}
+        self.assertEqual(bench.compare(results, baseline), ['a'])
+        self.assertEqual(bench.compare(results, baseline, 0.05), ['a', 'b'])
+
+    def test_search_stats(self):
+        """Test search counters are recorded per depth and piece."""
+        stats = SearchStats()
+        variants = get_variants(3, 3, kings=2, rooks=1, stats=stats)
+        self.assertEqual(variants, get_variants(3, 3, kings=2, rooks=1))
+        self.assertEqual(stats.symbols, ['R', 'K', 'K'])
+        # rook goes anywhere, kings only where a final board is made
+        self.assertEqual(stats.nodes[0], 9)
+        self.assertEqual(stats.nodes[-1], len(variants))
+        for d in range(3):
+            # every square from the lowest allowed one is tried
+            self.assertEqual(
+                stats.nodes[d] + stats.occupied[d] + stats.attacked[d] +
+                stats.attacking[d] + stats.skipped[d],
+                9 * (stats.nodes[d - 1] if d else 1)
+            )
+        self.assertGreater(stats.skipped[2], 0)
+        self.assertEqual(list(stats.by_piece()), ['R', 'K'])
+        self.assertEqual(
+            stats.by_piece()['K']['nodes'], stats.nodes[1] + stats.nodes[2]
+        )
+        self.assertIn('attacking', stats.report())
+
+        # counters of a search stopped early are kept
+        stats = SearchStats()
+        variants = get_variants(6, 6, kings=3, rooks=2, stats=stats,
+                                limit=10)
+        self.assertEqual(len(variants), 10)
+        self.assertEqual(len(stats.symbols), 5)
+        self.assertEqual(stats.nodes[:2], [1, 1])
+        for d in range(1, 5):
+            self.assertGreater(stats.nodes[d], 0)
+            self.assertGreater(stats.attacked[d], 0)
+        self.assertGreaterEqual(stats.nodes[-1], 10)
+        self.assertGreater(sum(stats.time), 0)
+
+        with self.assertRaises(ValueError):
+            get_variants(3, 3, kings=2, symmetry=True, stats=SearchStats())
+
+        with mock.patch('sys.stdout') as stdout:
+            self.assertEqual(
+                main(3, 3, 2, 0, 0, 1, count_only=True, stats=True), 4
+            )
+        printed = ''.join(c[0][0] for c in stdout.write.call_args_list)
+        self.assertIn('nodes', printed)
+        self.assertNotIn('K', printed.split('Got')[0])
+
+    def test_progress(self):
+        """Test progress reports of a search."""
+        pieces = dict(kings=2, queens=1, knights=1)
+        variants = get_variants(5, 4, **pieces)
+        with mock.patch.object(chess_challenge, 'PROGRESS_INTERVAL', 0):
+            for workers in (1, 2):
+                reports = []
+                self.assertEqual(
+                    get_variants(5, 4, workers=workers,
+                                 progress=reports.append, **pieces),
+                    variants
+                )
+                self.assertGreater(len(reports), 2)
+                fractions = [r.fraction for r in reports]
+                self.assertEqual(fractions, sorted(fractions))
+                self.assertEqual(reports[-1].fraction, 1)
+                self.assertEqual(reports[-1].found, len(variants))
+                self.assertEqual(reports[-1].eta, 0)
+
+                reports = []
+                self.assertEqual(
+                    count_variants(5, 4, workers=workers, memo=100,
+                                   progress=reports.append, **pieces),
+                    len(variants)
+                )
+                self.assertEqual(reports[-1].found, len(variants))
+
+            reports = []
+            self.assertEqual(
+                count_variants(3, 3, progress=reports.append), 1
+            )
+            self.assertEqual(reports[-1].fraction, 1)
+
+            # identical pieces make subtrees, not one per variant
+            reports = []
+            self.assertEqual(
+                count_variants(5, 4, knights=5, progress=reports.append),
+                1968
+            )
+            self.assertGreater(len(reports), 2)
+            self.assertLess(len(reports), 200)
+
+        # reports are throttled
+        reports = []
+        get_variants(5, 4, progress=reports.append, **pieces)
+        self.assertEqual(len(reports), 1)
+
+        with self.assertRaises(ValueError):
+            count_variants(3, 3, kings=1, symmetry=True, progress=print)
+
+        with mock.patch('sys.stderr') as stderr:
+            main(3, 3, 2, 0, 0, 1, full_output=False, progress=True)
+        self.assertIn('100.0% done', stderr.write.call_args_list[0][0][0])
+
+    def test_early_stop(self):
+        """Test searches stopped by a limit or a time budget."""
+        pieces = dict(kings=2, queens=1, knights=1)
+        variants = get_variants(5, 4, **pieces)
+        self.assertTrue(variants.complete)
+        for engine in ENGINES[:3]:
+            found = get_variants(5, 4, limit=5, engine=engine, **pieces)
+            self.assertEqual(found, variants[:5])
+            self.assertFalse(found.complete)
+        found = get_variants(5, 4, limit=len(variants) + 1, **pieces)
+        self.assertEqual(found, variants)
+        self.assertTrue(found.complete)
+        # the search is not carried on past the limit to find no more
+        found = get_variants(5, 4, limit=len(variants), **pieces)
+        self.assertEqual(found, variants)
+        self.assertFalse(found.complete)
+        found = get_variants(5, 4, time_budget=60, compact=True,
+                             order='dynamic', **pieces)
+        self.assertEqual(len(found), len(variants))
+        self.assertTrue(found.complete)
+
+        # no variants at all and no time to look for them
+        for engine in ENGINES[:3]:
+            found = get_variants(9, 9, queens=10, time_budget=0.05,
+                                 engine=engine)
+            self.assertEqual(found, [])
+            self.assertFalse(found.complete)
+        found = get_variants(9, 9, queens=10, time_budget=0.05,
+                             order='dynamic')
+        self.assertFalse(found.complete)
+        # also while tracking progress or stats
+        for options in (dict(progress=lambda _: None),
+                        dict(order='dynamic', progress=lambda _: None),
+                        dict(stats=SearchStats())):
+            start = time.time()
+            found = get_variants(9, 9, queens=10, time_budget=0.05,
+                                 **options)
+            self.assertLess(time.time() - start, 5)
+            self.assertFalse(found.complete)
+
+        stream = iter_variants(5, 4, limit=3, **pieces)
+        self.assertEqual(list(stream), variants[:3])
+        self.assertFalse(stream.complete)
+
+        with self.assertRaises(ValueError):
+            get_variants(5, 4, workers=2, limit=3, **pieces)
+
+        with mock.patch('sys.stdout') as stdout:
+            self.assertEqual(
+                main(5, 4, 2, 1, 0, 0, 1, count_only=True, limit=3), 3
+            )
+        printed = ''.join(c[0][0] for c in stdout.write.call_args_list)
+        self.assertIn('stopped early', printed)
+
+    def test_work_units(self):
+        """Test a split search run unit by unit in separate processes."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        pieces = dict(kings=2, queens=1, knights=2)
+        variants = sorted(get_variants(5, 4, compact=True, **pieces))
+
+        units = work_units.split(5, 4, units=3, directory=tmp, **pieces)
+        self.assertEqual(len(units), 3)
+        script = os.path.join(os.path.dirname(__file__), 'work_units.py')
+        processes = [
+            subprocess.Popen(
+                [sys.executable, script, 'run-unit', unit,
+                 '--output', unit + '.sol'],
+                stdout=subprocess.DEVNULL
+            )
+            for unit in units
+        ]
+        self.assertEqual([p.wait() for p in processes], [0, 0, 0])
+
+        results = [os.path.splitext(unit)[0] + '.result' for unit in units]
+        output = os.path.join(tmp, 'all.sol')
+        self.assertEqual(work_units.merge(results, output), len(variants))
+        with SolutionFile(output) as f:
+            self.assertEqual(sorted(f), variants)
+        with self.assertRaises(ValueError):
+            work_units.merge(results[1:])
+        with self.assertRaises(ValueError):
+            work_units.merge(results + results[:1])
+
+        # identical pieces split between placed and left ones
+        for depth in (1, 2, 3):
+            units = work_units.split(5, 4, queens=2, rooks=2, units=2,
+                                     directory=tmp, depth=depth)
+            self.assertEqual(
+                sum(work_units.run_unit(unit) for unit in units),
+                count_variants(5, 4, queens=2, rooks=2)
+            )
+
+    def test_solve_many(self):
+        """Test batch of tasks comes back in input order."""
+        configs = read_configs([
+            '# M N K Q B R N',
+            '5 4 2 1 0 0 1',
+            '',
+            '3 3 2 0 0 1 0',
+            '  4 4 0 0 0 2 4 ',
+            '3 3 2 0 0 1 0',
+        ])
+        self.assertEqual(len(configs), 4)
+        expected = [count_variants(*config) for config in configs]
+        self.assertEqual(solve_many(configs), expected)
+        self.assertEqual(solve_many(configs, memo=0), expected)
+        self.assertEqual(
+            solve_many(configs, count_only=False),
+            [get_variants(*config, compact=True) for config in configs]
+        )
+        self.assertEqual(solve_many([]), [])
+
+        for line in ('3 3 2 0 0 1', '3 3 2 0 0 1 x', '3 3 2 0 0 1 0 0'):
+            with self.assertRaises(ValueError):
+                read_configs([line])
+
+    def test_result_cache(self):
+        """Test results kept on disk are reused and evicted."""
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        pieces = dict(kings=2, queens=1, knights=1)
+        variants = get_variants(5, 4, compact=True, **pieces)
+        config = (5, 4, 2, 1, 0, 0, 1)
+
+        cache = ResultCache(tmp, maxsize=2, keep_solutions=True)
+        self.addCleanup(cache.close)
+        self.assertEqual(count_variants(3, 3, kings=1, cache=cache), 9)
+        with mock.patch.object(chess_challenge, '_count_finals') as count:
+            self.assertEqual(count_variants(3, 3, kings=1, cache=cache), 9)
+            self.assertFalse(count.called)
+
+        # a search stopped half way stores nothing
+        stream = iter_variants(5, 4, cache=cache, **pieces)
+        next(stream)
+        stream.close()
+        self.assertIsNone(cache.count(config))
+        self.assertEqual(os.listdir(tmp), ['results.sqlite'])
+
+        self.assertEqual(
+            get_variants(5, 4, compact=True, cache=cache, **pieces), variants
+        )
+        self.assertEqual(cache.count(config), len(variants))
+        with mock.patch.object(chess_challenge, '_finals') as search:
+            self.assertEqual(
+                get_variants(5, 4, cache=cache, **pieces),
+                [decode_variant(5, 4, v) for v in variants]
+            )
+            self.assertEqual(count_variants(5, 4, cache=cache, **pieces),
+                             len(variants))
+            self.assertFalse(search.called)
+
+        # other solver versions do not see the results
+        with ResultCache(tmp, version=2) as other:
+            self.assertIsNone(other.count(config))
+
+        # least recently used entries go first
+        cache.count(config)
+        count_variants(3, 3, queens=1, cache=cache)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.count((3, 3, 1, 0, 0, 0, 0)))
+        self.assertIsNotNone(cache.solutions(config))
+
+        # solution files count towards the size limit
+        cache.max_bytes = 10
+        count_variants(3, 3, rooks=1, cache=cache)
+        self.assertIsNone(cache.count(config))
+        self.assertEqual(
+            sorted(os.listdir(tmp)), ['results.sqlite']
+        )
+
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+        # only counts unless asked to keep solutions
+        with ResultCache(tmp) as counts:
+            with mock.patch('sys.stdout'):
+                self.assertEqual(
+                    main(5, 4, 2, 1, 0, 0, 1, cache=counts), len(variants)
+                )
+            self.assertEqual(counts.count(config), len(variants))
+            self.assertIsNone(counts.solutions(config))
+
+            # every order counts on a cache miss
+            for order in ORDERS:
+                counts.clear()
+                self.assertEqual(
+                    count_variants(4, 4, rooks=2, knights=4, order=order,
+                                   cache=counts), 8
+                )
+                self.assertEqual(counts.count((4, 4, 0, 0, 0, 2, 4)), 8)
+
+    def test_server(self):
+        """Test solver service answers, cancels and reports queue."""
+        responses = {}
+
+        def send(response):
+            responses.setdefault(response['id'], []).append(response)
+
+        def lines(solver):
+            yield json.dumps({'id': 'long', 'op': 'count',
+                              'config': [7, 7, 2, 2, 2, 0, 1]})
+            yield json.dumps({'id': 'queued', 'op': 'count',
+                              'config': [7, 7, 2, 2, 2, 0, 1]})
+            yield json.dumps({'id': 'page', 'op': 'page', 'offset': 1,
+                              'size': 2, 'config': [3, 3, 2, 0, 0, 1, 0]})
+            while not solver.status()['running']:
+                time.sleep(0.01)
+            yield json.dumps({'id': 'status', 'op': 'status'})
+            yield json.dumps({'id': 'c1', 'op': 'cancel', 'target': 'long'})
+            yield json.dumps({'id': 'c2', 'op': 'cancel',
+                              'target': 'queued'})
+            yield json.dumps({'id': 'bad', 'op': 'page', 'config': [3, 3]})
+            yield 'not json'
+            # unhashable or missing ids are refused
+            yield json.dumps({'id': [1], 'op': 'count',
+                              'config': [3, 3, 2, 0, 0, 1, 0]})
+            yield json.dumps({'id': 'c3', 'op': 'cancel', 'target': {}})
+            yield json.dumps({'op': 'count', 'config': [3, 3, 2, 0, 0, 1, 0]})
+
+        start_t = time.time()
+        with server.Server(workers=1) as solver:
+            solver.handle(lines(solver), send)
+            solver.handle(
+                ['{"id": 1, "op": "count", "config": [5, 4, 2, 1, 0, 0, 1]}'],
+                send
+            )
+        self.assertLess(time.time() - start_t, 5)
+
+        self.assertEqual(responses['long'], [{'id': 'long',
+                                              'cancelled': True}])
+        self.assertEqual(responses['queued'], [{'id': 'queued',
+                                                'cancelled': True}])
+        self.assertEqual(responses['c1'], [{'id': 'c1', 'cancelled': True}])
+        status = responses['status'][0]
+        self.assertGreaterEqual(status['running'], 1)
+        self.assertEqual(status['running'] + status['queued'], 3)
+        self.assertEqual(responses['page'], [{
+            'id': 'page', 'offset': 1,
+            'variants': get_variants(3, 3, kings=2, rooks=1,
+                                     compact=True)[1:3]
+        }])
+        self.assertIn('error', responses['bad'][0])
+        self.assertEqual(len(responses[None]), 4)
+        for response in responses[None]:
+            self.assertIn('error', response)
+        self.assertNotIn('c3', responses)
+        self.assertEqual(responses[1][0]['count'],
+                         count_variants(5, 4, kings=2, queens=1, knights=1))
+
+    def test_nth_variant(self):
+        """Test random access to variants in search order."""
+        for config in [
+            (5, 4, 2, 1, 0, 0, 1),
+            (4, 4, 0, 0, 0, 2, 4),
+            (5, 5, 0, 2, 2, 0, 0),
+            (5, 4, 0, 0, 0, 0, 5),
+            (3, 3, 0, 0, 0, 0, 0),
+        ]:
+            variants = get_variants(*config, compact=True)
+            self.assertEqual(
+                [nth_variant(config, k) for k in range(len(variants))],
+                variants
+            )
+            self.assertEqual(nth_variant(config, -1), variants[-1])
+            for k in (len(variants), -len(variants) - 1):
+                with self.assertRaises(IndexError):
+                    nth_variant(config, k)
+
+            for offset, size in [(0, 1), (0, 7), (3, 5), (1, 0),
+                                 (max(len(variants) - 2, 0), 10),
+                                 (len(variants), 3)]:
+                self.assertEqual(
+                    variants_page(config, offset, size),
+                    variants[offset:offset + size]
+                )
+        with self.assertRaises(IndexError):
+            nth_variant((3, 3, 0, 0, 0, 0, 9), 0)
+        self.assertEqual(variants_page((3, 3, 0, 0, 0, 0, 9), 0, 5), [])
+
+    def test_sample_variants(self):
+        """Test uniform, reproducible sampling of variants."""
+        config = (5, 4, 2, 1, 0, 0, 1)
+        variants = get_variants(*config, compact=True)
+
+        sample = sample_variants(config, 10, seed=7)
+        self.assertEqual(sample, sample_variants(config, 10, seed=7))
+        self.assertNotEqual(sample, sample_variants(config, 10, seed=8))
+        self.assertEqual(len(set(sample)), 10)
+        self.assertTrue(set(sample) <= set(variants))
+        self.assertEqual(
+            sorted(sample_variants(config, len(variants), seed=1)),
+            sorted(variants)
+        )
+
+        # every variant is about equally likely
+        draws = 50 * len(variants)
+        counts = dict.fromkeys(variants, 0)
+        for variant in sample_variants(config, draws, seed=3, replace=True):
+            counts[variant] += 1
+        self.assertLess(max(counts.values()), 100)
+        self.assertGreater(min(counts.values()), 15)
+
+        self.assertEqual(sample_variants(config, 0), [])
+        with self.assertRaises(ValueError):
+            sample_variants(config, len(variants) + 1)
+        with self.assertRaises(ValueError):
+            sample_variants((3, 3, 0, 0, 0, 0, 9), 1, replace=True)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,221 @@
+"""
+Work units spreading one chess challenge search over several hosts.
+
+`split` places the first pieces of a task in every valid way and deals
+the resulting boards out into self-contained unit files. `run-unit`
+solves one unit anywhere the solver is installed, `merge` checks all
+units of a split are there and sums their counts, joining solution
+files if units wrote them.
+
+    python work_units.py split 7 7 2 2 2 0 1 --units 16 --dir units
+    python work_units.py run-unit units/unit-0003.json --output u3.sol
+    python work_units.py merge units/*.result --output all.sol
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from chess_challenge import (
+    Board, _count, _order_pieces, _pieces, _prefixes, _reccur
+)
+from solution_file import SolutionFile, SolutionWriter
+
+# number of pieces placed by `split`
+SPLIT_DEPTH = 2
+
+
+def split(M, N, kings=0, queens=0, bishops=0, rooks=0, knights=0,
+          units=1, directory='.', depth=SPLIT_DEPTH):
+    """
+    Split the task into `units` unit files in `directory`.
+
+    First `depth` pieces (in static order) are placed in every valid
+    way, the boards are dealt out to units round robin so every unit
+    gets a share of both crowded and sparse subtrees. A unit lists the
+    squares of the placed pieces of each of its boards.
+
+    Returns paths of the unit files.
+    """
+    counts = [kings, queens, bishops, rooks, knights]
+    pieces = _order_pieces(M, N, _pieces(*counts), 'static')
+    depth = min(depth, len(pieces))
+
+    prefixes = [[] for _ in range(units)]
+    for k, board in enumerate(_prefixes(M, N, Board(M, N), pieces, depth)):
+        prefixes[k % units].append([square for square, _ in board.pieces])
+
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for unit, unit_prefixes in enumerate(prefixes):
+        path = os.path.join(directory, 'unit-{:04d}.json'.format(unit))
+        with open(path, 'w') as f:
+            json.dump({
+                'config': [M, N] + counts,
+                'unit': unit,
+                'units': units,
+                'depth': depth,
+                'prefixes': unit_prefixes,
+            }, f)
+        paths.append(path)
+    return paths
+
+
+def _subtrees(unit):
+    """
+    Yield (board, pieces_left, start) of every board of the unit.
+
+    `start` is the lowest square the next piece may take, it has to go
+    after the last placed one if they are identical.
+    """
+    M, N = unit['config'][:2]
+    pieces = _order_pieces(M, N, _pieces(*unit['config'][2:]), 'static')
+    depth = unit['depth']
+    pieces_left = pieces[depth:]
+    same = 0 < depth < len(pieces) and \
+        type(pieces[depth]) is type(pieces[depth - 1])
+
+    for squares in unit['prefixes']:
+        board = Board(M, N)
+        for piece, square in zip(pieces, squares):
+            board = board.place(piece, square // N, square % N)
+        yield board, pieces_left, squares[-1] + 1 if same else 0
+
+
+def run_unit(path, output=None, result=None):
+    """
+    Solve the unit in file `path`.
+
+    Without `output` variants are only counted, with it they are
+    written into that solution file. The count goes to `result` file
+    (unit path with `.result` suffix by default), with the
+    solution file path relative to it.
+
+    Returns the number of variants.
+    """
+    with open(path) as f:
+        unit = json.load(f)
+    M, N = unit['config'][:2]
+
+    count = 0
+    if output:
+        with SolutionWriter(output, *unit['config']) as writer:
+            for board, pieces_left, start in _subtrees(unit):
+                for final in _reccur(M, N, board, pieces_left, start):
+                    writer.write(tuple(sorted(final.pieces)))
+        count = writer.count
+    else:
+        for board, pieces_left, start in _subtrees(unit):
+            count += _count(
+                M, N, board.occupied, board.attacked, pieces_left, start
+            )
+
+    if result is None:
+        result = os.path.splitext(path)[0] + '.result'
+    if output:
+        output = os.path.relpath(output, os.path.dirname(result) or '.')
+    with open(result, 'w') as f:
+        json.dump({
+            'config': unit['config'],
+            'unit': unit['unit'],
+            'units': unit['units'],
+            'count': count,
+            'output': output,
+        }, f)
+    return count
+
+
+def merge(paths, output=None):
+    """
+    Sum counts of unit result files at `paths`.
+
+    Results have to cover every unit of one split exactly once. With
+    `output` the units' solution files are joined into that one, all
+    units must have written one then.
+
+    Returns the total number of variants.
+    """
+    results = []
+    for path in paths:
+        with open(path) as f:
+            results.append(json.load(f))
+        results[-1]['path'] = path
+    if not results:
+        raise ValueError('No unit results to merge')
+
+    config = results[0]['config']
+    units = results[0]['units']
+    if any(r['config'] != config or r['units'] != units for r in results):
+        raise ValueError('Unit results are from different splits')
+    found = sorted(r['unit'] for r in results)
+    if found != list(range(units)):
+        raise ValueError('Expected results of units 0..{}, got {}'.format(
+            units - 1, found
+        ))
+
+    if output:
+        if any(r['output'] is None for r in results):
+            raise ValueError('Not all units wrote a solution file')
+        with SolutionWriter(output, *config) as writer:
+            for r in sorted(results, key=lambda r: r['unit']):
+                solutions = os.path.join(
+                    os.path.dirname(r['path']), r['output']
+                )
+                with SolutionFile(solutions) as f:
+                    for i in range(len(f)):
+                        writer.write_record(f.record(i))
+
+    return sum(r['count'] for r in results)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Spread a chess challenge search over work units.'
+    )
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    split_parser = commands.add_parser(
+        'split', help='split a task into unit files'
+    )
+    for name in ('M', 'N', 'kings', 'queens', 'bishops', 'rooks',
+                 'knights'):
+        split_parser.add_argument(name, type=int)
+    split_parser.add_argument('--units', type=int, required=True,
+                              help='number of units')
+    split_parser.add_argument('--dir', default='.',
+                              help='directory to write units to')
+    split_parser.add_argument('--depth', type=int, default=SPLIT_DEPTH,
+                              help='pieces placed before splitting')
+
+    run_parser = commands.add_parser('run-unit', help='solve one unit')
+    run_parser.add_argument('unit')
+    run_parser.add_argument('--output', metavar='FILE',
+                            help='write variants to binary solution FILE')
+    run_parser.add_argument('--result', metavar='FILE',
+                            help='result file, next to the unit by default')
+
+    merge_parser = commands.add_parser('merge', help='combine unit results')
+    merge_parser.add_argument('results', nargs='+')
+    merge_parser.add_argument('--output', metavar='FILE',
+                              help='join units solution files into FILE')
+
+    args = parser.parse_args(argv)
+    if args.command == 'split':
+        paths = split(
+            args.M, args.N, args.kings, args.queens, args.bishops,
+            args.rooks, args.knights, args.units, args.dir, args.depth
+        )
+        print('Wrote {} units to {}'.format(len(paths), args.dir))
+    elif args.command == 'run-unit':
+        count = run_unit(args.unit, args.output, args.result)
+        print('Got {} variants'.format(count))
+    else:
+        count = merge(args.results, args.output)
+        print('Got {} variants'.format(count))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())